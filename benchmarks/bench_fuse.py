@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+"""
+DataTransformer fusion benchmark.
+
+Runs a linear chain of DataTransformer nodes over a sizable input, with and
+without fusion. Unfused, every node converts the state and its input to Lua
+tables and back; fused, the chain does it once.
+
+    python benchmarks/bench_fuse.py [--runs 20] [--depth 10] [--items 2000]
+"""
+import sys
+import time
+import asyncio
+import argparse
+import pyfreeflow
+
+
+def graph(depth):
+    node = [{"name": "t{}".format(i), "type": "DataTransformer",
+             "version": "1.0",
+             "config": {"transformer": "data.v = data.v + 1; "
+                        "state.c = (state.c or 0) + 1"}}
+            for i in range(depth)]
+    digraph = [" -> ".join(["t{}".format(i) for i in range(depth)])]
+    return node, digraph
+
+
+async def bench(fuse, runs, depth, items):
+    node, digraph = graph(depth)
+    pipe = pyfreeflow.pipeline.Pipeline()
+    await pipe.init(node=node, digraph=digraph, name="bench", fuse=fuse)
+
+    data = {"v": 0, "payload": [{"i": i, "s": "x" * 20} for i in range(items)]}
+    start = time.perf_counter()
+    for _ in range(runs):
+        await pipe.run(data)
+    elapsed = (time.perf_counter() - start) / runs
+
+    await pipe.fini()
+    return elapsed
+
+
+async def main(argv):
+    argparser = argparse.ArgumentParser("bench_fuse")
+    argparser.add_argument("--runs", type=int, default=20)
+    argparser.add_argument("--depth", type=int, default=10)
+    argparser.add_argument("--items", type=int, default=2000)
+    args = argparser.parse_args(argv)
+
+    pyfreeflow.load_extension("pyfreeflow.ext.data_transformer")
+
+    print("{:<6} {:>10}".format("fuse", "run (ms)"))
+    for fuse in (False, True):
+        run = await bench(fuse, args.runs, args.depth, args.items)
+        print("{:<6} {:>10.1f}".format(str(fuse), run * 1e3))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+"""
+Thread pool offload benchmark.
+
+Runs a source fanning out to parallel CPU bound nodes, a DataTransformer
+running a Lua loop or a JsonBufferOperator parsing a large document, once
+with the nodes on the event loop and once with executor: thread. The event
+loop lag is sampled by LoopLagMonitor while the pipeline runs; it is what
+every other in-flight request of the process would wait.
+
+Work that holds the GIL for the whole call (json.loads of one big document)
+still stalls the loop from a thread, since the loop cannot run until the
+call returns.
+
+    python benchmarks/bench_offload.py [--runs 5] [--items 50000] [--width 4]
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import pyfreeflow
+from pyfreeflow.ext.types import FreeFlowExt
+from pyfreeflow.utils import LoopLagMonitor
+
+LUA_LOOP = """
+local n = 0
+for i = 1, 50000000 do
+  n = n + i % 7
+end
+data = {n = n}
+"""
+
+
+class BlobOperatorV1_0(FreeFlowExt):
+    __typename__ = "BenchBlobOperator"
+    __version__ = "1.0"
+
+    def __init__(self, name, items=200000, max_tasks=4):
+        super().__init__(name, max_tasks=max_tasks)
+        self._blob = json.dumps([{"id": i, "name": "item-{}".format(i),
+                                  "tags": ["a", "b", "c"]}
+                                 for i in range(items)])
+
+    async def run(self, state, data):
+        return state, ({"op": "read", "data": self._blob}, 0)
+
+
+def lua_nodes(executor, items, width):
+    node = [{"name": "src", "type": "BenchBlobOperator", "version": "1.0",
+             "config": {"items": 1}}]
+    digraph = []
+    for i in range(width):
+        node.append({"name": "lua{}".format(i), "type": "DataTransformer",
+                     "version": "1.0", "executor": executor,
+                     "config": {"transformer": LUA_LOOP}})
+        digraph.append("src -> lua{}".format(i))
+    return node, digraph
+
+
+def json_nodes(executor, items, width):
+    node = [{"name": "src", "type": "BenchBlobOperator", "version": "1.0",
+             "config": {"items": items}}]
+    digraph = []
+    for i in range(width):
+        node.append({"name": "parse{}".format(i),
+                     "type": "JsonBufferOperator", "version": "1.0",
+                     "executor": executor})
+        digraph.append("src -> parse{}".format(i))
+    return node, digraph
+
+
+WORKLOADS = {
+    "lua": lua_nodes,
+    "json": json_nodes,
+}
+
+
+async def bench(workload, executor, runs, items, width):
+    node, digraph = WORKLOADS[workload](executor, items, width)
+    pipe = pyfreeflow.pipeline.Pipeline()
+    await pipe.init(node=node, digraph=digraph, name="bench", threads=width)
+
+    monitor = LoopLagMonitor(interval=0.001)
+    monitor.start()
+    start = time.perf_counter()
+    for _ in range(runs):
+        await pipe.run({})
+    elapsed = (time.perf_counter() - start) / runs
+    lag = await monitor.stop()
+
+    await pipe.fini()
+    return elapsed, lag
+
+
+async def main(argv):
+    argparser = argparse.ArgumentParser("bench_offload")
+    argparser.add_argument("--runs", type=int, default=5)
+    argparser.add_argument("--items", type=int, default=50000)
+    argparser.add_argument("--width", type=int, default=4)
+    args = argparser.parse_args(argv)
+
+    pyfreeflow.load_extension("pyfreeflow.ext.buffer_operator")
+    pyfreeflow.load_extension("pyfreeflow.ext.data_transformer")
+
+    print("{:<8} {:<8} {:>10} {:>14} {:>14} {:>8}".format(
+        "workload", "executor", "run (ms)", "lag p99 (ms)", "lag max (ms)",
+        "samples"))
+    for workload in WORKLOADS.keys():
+        for executor in ("loop", "thread"):
+            run, lag = await bench(workload, executor, args.runs, args.items,
+                                   args.width)
+            print("{:<8} {:<8} {:>10.1f} {:>14.1f} {:>14.1f} {:>8}".format(
+                workload, executor, run * 1e3, lag["p99"] * 1e3,
+                lag["max"] * 1e3, lag["samples"]))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+"""
+Critical path priority benchmark.
+
+Runs a graph made of a deep chain and many short leaf branches joined by a
+sink, under a max_concurrency cap, with and without priority scheduling.
+Without priority the ready nodes start in plan order and the leaves delay
+the chain; with priority the node latencies learned by the first run put
+the chain first.
+
+    python benchmarks/bench_priority.py [--runs 3] [--depth 8] [--width 16] [--cap 2]
+"""
+import sys
+import time
+import asyncio
+import argparse
+import pyfreeflow
+
+
+def graph(depth, width, sleep):
+    node = [{"name": "src", "type": "SleepOperator", "version": "1.0",
+             "config": {"sleep": 0}},
+            {"name": "sink", "type": "SleepOperator", "version": "1.0",
+             "config": {"sleep": 0}}]
+    digraph = []
+    for i in range(width):
+        node.append({"name": "leaf{}".format(i), "type": "SleepOperator",
+                     "version": "1.0", "config": {"sleep": sleep}})
+        digraph += ["src -> leaf{}".format(i), "leaf{} -> sink".format(i)]
+
+    chain = ["chain{}".format(i) for i in range(depth)]
+    for x in chain:
+        node.append({"name": x, "type": "SleepOperator", "version": "1.0",
+                     "config": {"sleep": sleep}})
+    digraph.append(" -> ".join(["src"] + chain + ["sink"]))
+    return node, digraph
+
+
+async def bench(priority, runs, depth, width, cap, sleep):
+    node, digraph = graph(depth, width, sleep)
+    pipe = pyfreeflow.pipeline.Pipeline()
+    await pipe.init(node=node, digraph=digraph, name="bench",
+                    max_concurrency=cap, priority=priority)
+
+    # learn the node latencies
+    await pipe.run({})
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        await pipe.run({})
+    elapsed = (time.perf_counter() - start) / runs
+
+    await pipe.fini()
+    return elapsed
+
+
+async def main(argv):
+    argparser = argparse.ArgumentParser("bench_priority")
+    argparser.add_argument("--runs", type=int, default=3)
+    argparser.add_argument("--depth", type=int, default=8)
+    argparser.add_argument("--width", type=int, default=16)
+    argparser.add_argument("--cap", type=int, default=2)
+    argparser.add_argument("--sleep", type=float, default=0.05)
+    args = argparser.parse_args(argv)
+
+    pyfreeflow.load_extension("pyfreeflow.ext.sleep_operator")
+
+    ideal = max(args.depth, (args.depth + args.width) / args.cap) * args.sleep
+    print("lower bound: {:.1f} ms".format(ideal * 1e3))
+    print("{:<9} {:>10}".format("priority", "run (ms)"))
+    for priority in (False, True):
+        run = await bench(priority, args.runs, args.depth, args.width,
+                          args.cap, args.sleep)
+        print("{:<9} {:>10.1f}".format(str(priority), run * 1e3))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+"""
+Process pool scaling benchmark.
+
+Runs a source fanning out to parallel DataTransformer nodes executing a
+heavy Lua script, on the event loop and with executor: process for a
+growing number of worker processes. The first run of each pool is excluded,
+it pays for spawning the workers and instantiating the nodes.
+
+    python benchmarks/bench_process.py [--runs 5] [--width 8] [--workers 1 2 4 8]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import pyfreeflow
+
+LUA_SCRIPT = """
+local n = 0
+for i = 1, 20000000 do
+  n = n + i % 7
+end
+local t = {}
+for i = 1, 200000 do
+  t[#t + 1] = tostring(i) .. ":" .. tostring(n)
+end
+data = {n = n, items = #t}
+"""
+
+
+async def bench(executor, workers, runs, width):
+    node = [{"name": "src", "type": "DataTransformer", "version": "1.0",
+             "config": {"transformer": "data = {}"}},
+            {"name": "sink", "type": "DataTransformer", "version": "1.0",
+             "config": {"transformer": "data = {}"}}]
+    digraph = []
+    for i in range(width):
+        node.append({"name": "lua{}".format(i), "type": "DataTransformer",
+                     "version": "1.0", "executor": executor,
+                     "config": {"transformer": LUA_SCRIPT}})
+        digraph += ["src -> lua{}".format(i), "lua{} -> sink".format(i)]
+
+    pipe = pyfreeflow.pipeline.Pipeline()
+    await pipe.init(node=node, digraph=digraph, name="bench",
+                    processes=workers)
+
+    await pipe.run({})
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        await pipe.run({})
+    elapsed = (time.perf_counter() - start) / runs
+
+    await pipe.fini()
+    return elapsed
+
+
+async def main(argv):
+    argparser = argparse.ArgumentParser("bench_process")
+    argparser.add_argument("--runs", type=int, default=5)
+    argparser.add_argument("--width", type=int, default=8)
+    argparser.add_argument("--workers", type=int, nargs="+",
+                           default=[1, 2, 4, 8])
+    args = argparser.parse_args(argv)
+
+    pyfreeflow.load_extension("pyfreeflow.ext.data_transformer")
+
+    print("cpus: {}".format(os.cpu_count()))
+    print("{:<8} {:>8} {:>10} {:>8}".format(
+        "executor", "workers", "run (ms)", "speedup"))
+    base = await bench("loop", None, args.runs, args.width)
+    print("{:<8} {:>8} {:>10.1f} {:>8.2f}".format("loop", "-", base * 1e3,
+                                                   1.0))
+    for workers in args.workers:
+        run = await bench("process", workers, args.runs, args.width)
+        print("{:<8} {:>8} {:>10.1f} {:>8.2f}".format(
+            "process", workers, run * 1e3, base / run))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+"""
+Scheduler overhead benchmark.
+
+Runs pipelines made of no-op nodes and reports the scheduling cost per node
+for growing graph sizes. Two shapes are measured: a wide graph (one source
+fanning out to N nodes joined by a sink) and a linear chain.
+
+    python benchmarks/bench_scheduler.py [--runs 20] [--sizes 10 100 1000 5000]
+"""
+import sys
+import time
+import asyncio
+import argparse
+import pyfreeflow
+from pyfreeflow.ext.types import FreeFlowExt
+
+
+class NoopOperatorV1_0(FreeFlowExt):
+    __typename__ = "BenchNoopOperator"
+    __version__ = "1.0"
+
+    async def run(self, state, data):
+        return state, ({}, 0)
+
+
+def wide(n):
+    node = ["n{}".format(i) for i in range(n)]
+    digraph = ["src -> {}".format(x) for x in node]
+    digraph += ["{} -> sink".format(x) for x in node]
+    return ["src", "sink"] + node, digraph
+
+
+def chain(n):
+    node = ["n{}".format(i) for i in range(n)]
+    digraph = ["{} -> {}".format(a, b) for a, b in zip(node, node[1:])]
+    return node, digraph
+
+
+SHAPES = {
+    "wide": wide,
+    "chain": chain,
+}
+
+
+async def bench(shape, size, runs):
+    names, digraph = SHAPES[shape](size)
+    pipe = pyfreeflow.pipeline.Pipeline()
+    await pipe.init(
+        node=[{"name": x, "type": "BenchNoopOperator", "version": "1.0"}
+              for x in names],
+        digraph=digraph, name="bench")
+
+    await pipe.run({})
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        await pipe.run({})
+    elapsed = (time.perf_counter() - start) / runs
+
+    await pipe.fini()
+    return elapsed, elapsed / len(names)
+
+
+async def main(argv):
+    argparser = argparse.ArgumentParser("bench_scheduler")
+    argparser.add_argument("--runs", type=int, default=20)
+    argparser.add_argument("--sizes", type=int, nargs="+",
+                           default=[10, 100, 1000, 5000])
+    args = argparser.parse_args(argv)
+
+    print("{:<6} {:>6} {:>12} {:>14}".format(
+        "shape", "nodes", "run (ms)", "per node (us)"))
+    for shape in SHAPES.keys():
+        for size in args.sizes:
+            run, per_node = await bench(shape, size, args.runs)
+            print("{:<6} {:>6} {:>12.3f} {:>14.2f}".format(
+                shape, size, run * 1e3, per_node * 1e6))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
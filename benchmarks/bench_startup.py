@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+"""
+Pipeline startup benchmark.
+
+Measures the cold import time of pyfreeflow (as done by pyfreeflow-cli.py)
+and the time needed to compile digraphs of growing size. When networkx and
+pydot are installed, the former read_dot based construction is measured too.
+
+    python benchmarks/bench_startup.py [--repeat 5] [--sizes 10 100 1000 5000]
+"""
+import io
+import sys
+import time
+import argparse
+import subprocess
+from pyfreeflow.graph import ExecutionPlan
+
+
+def cold_import(module, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import " + module], check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def digraph(n):
+    node = ["n{}".format(i) for i in range(n)]
+    return ["src -> {}".format(x) for x in node] + \
+        ["{} -> sink".format(x) for x in node]
+
+
+def compile_native(lines):
+    return ExecutionPlan.compile(lines)
+
+
+def compile_pydot(lines):
+    import networkx as nx
+    G = nx.nx_pydot.read_dot(io.StringIO("digraph D {" + "\n".join(lines) + "}"))
+    return list(nx.topological_sort(G))
+
+
+def timeit(fn, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(lines)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv):
+    argparser = argparse.ArgumentParser("bench_startup")
+    argparser.add_argument("--repeat", type=int, default=5)
+    argparser.add_argument("--sizes", type=int, nargs="+",
+                           default=[10, 100, 1000, 5000])
+    args = argparser.parse_args(argv)
+
+    try:
+        import networkx  # noqa: F401
+        import pydot  # noqa: F401
+        legacy = True
+    except ImportError:
+        legacy = False
+
+    print("cold import (best of {})".format(args.repeat))
+    print("  {:<28} {:>10.1f} ms".format(
+        "pyfreeflow", cold_import("pyfreeflow", args.repeat) * 1e3))
+    if legacy:
+        print("  {:<28} {:>10.1f} ms".format(
+            "networkx + pydot", cold_import("networkx, pydot",
+                                            args.repeat) * 1e3))
+
+    print("digraph compile (best of {})".format(args.repeat))
+    print("  {:>6} {:>14} {:>14}".format("edges", "native (ms)",
+                                         "pydot (ms)" if legacy else ""))
+    for size in args.sizes:
+        lines = digraph(size)
+        a = timeit(compile_native, lines, args.repeat) * 1e3
+        b = "{:>14.2f}".format(timeit(compile_pydot, lines, 1) * 1e3) if legacy else ""
+        print("  {:>6} {:>14.2f} {}".format(len(lines), a, b))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+"""
+FreeFlowExt.unpack fan-out benchmark.
+
+Compares the worker based fan-out with the former implementation, which
+called asyncio.wait(FIRST_COMPLETED) over the pending tasks every time a
+slot freed up, on lists of growing size.
+
+    python benchmarks/bench_unpack.py [--sizes 1000 10000 100000] [--max-tasks 4 64]
+"""
+import sys
+import time
+import asyncio
+import argparse
+import pyfreeflow  # noqa: F401
+from pyfreeflow.ext.types import FreeFlowExt
+
+
+class EchoOperatorV1_0(FreeFlowExt):
+    __typename__ = "BenchEchoOperator"
+    __version__ = "1.0"
+
+    async def do(self, state, data):
+        await asyncio.sleep(0)
+        return state, (data, 0)
+
+
+async def legacy_unpack(self, state, data):
+    loop = asyncio.get_running_loop()
+
+    cur = self._max_tasks
+    _data = []
+    aws = []
+
+    for i, p in enumerate(data):
+        if cur == 0:
+            done, pending = await asyncio.wait(
+                aws, return_when=asyncio.FIRST_COMPLETED)
+            aws = list(pending)
+            cur += len(done)
+            for task in done:
+                _, t = await task
+                _data.append(t)
+
+        if p[1] == 0:
+            aws.append(loop.create_task(
+                self.do(state, p[0]),
+                name=self._name + "-unpack-" + str(i)))
+            cur -= 1
+        else:
+            _data.append(p)
+
+    if len(aws) > 0:
+        done, pending = await asyncio.wait(
+            aws, return_when=asyncio.ALL_COMPLETED)
+        for task in done:
+            state, t = await task
+            _data.append(t)
+
+    return state, _data
+
+
+async def bench(fn, ext, size):
+    data = [(i, 0) for i in range(size)]
+    start = time.perf_counter()
+    _, out = await fn(ext, {}, data)
+    elapsed = time.perf_counter() - start
+    return elapsed, [x[0] for x in out] == list(range(size))
+
+
+async def main(argv):
+    argparser = argparse.ArgumentParser("bench_unpack")
+    argparser.add_argument("--sizes", type=int, nargs="+",
+                           default=[1000, 10000, 100000])
+    argparser.add_argument("--max-tasks", type=int, nargs="+",
+                           default=[4, 64])
+    args = argparser.parse_args(argv)
+
+    print("{:>9} {:>8} {:>14} {:>14} {:>8}".format(
+        "max_tasks", "items", "legacy (ms)", "worker (ms)", "ordered"))
+    for max_tasks in args.max_tasks:
+        ext = EchoOperatorV1_0("bench", max_tasks=max_tasks)
+        for size in args.sizes:
+            a, _ = await bench(legacy_unpack, ext, size)
+            b, ordered = await bench(FreeFlowExt.unpack, ext, size)
+            print("{:>9} {:>8} {:>14.1f} {:>14.1f} {:>8}".format(
+                max_tasks, size, a * 1e3, b * 1e3, str(ordered)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,342 @@
+#!/usr/bin/python3
+import sys
+import math
+import argparse
+import pyfreeflow
+from pyfreeflow.utils import EnvVarParser, LoopLagMonitor
+import json
+import yaml
+import time
+import asyncio
+import itertools
+import threading
+import logging
+from aiohttp import web
+from platform import system
+
+if system() == "Linux":
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+"""
+Load test of a pipeline, with the configuration file of pyfreeflow-cli.py
+plus an optional bench section:
+
+bench:
+  runs: 1000  # Optional, default 100
+  warmup: 10  # Optional, runs not measured, default 0
+  concurrency: 8  # Optional, runs in flight, default 1
+  rate: 50  # Optional, runs started per second, default as fast as possible
+  timeout: 5  # Optional, timeout of every run in seconds
+  inputs:  # Optional, pipeline inputs used in turn, default the args section
+  - {id: 1}
+  - {id: 2}
+  servers:  # Optional, local stand-ins of the remote services
+  - host: "127.0.0.1"
+    port: 8080
+    routes:
+    - path: "/api/item"
+      method: "GET"  # Optional, default GET
+      status: 200  # Optional, default 200
+      delay: 0.02  # Optional, seconds before the response, default 0
+      headers: {}  # Optional
+      body: {id: 1}  # Optional, dict and list bodies are sent as json
+
+The command line options override the bench section. With rate, the latency
+of a run is measured from the time it was scheduled to start, so the runs
+waiting for a free concurrency slot are not hidden (coordinated omission).
+The stand-in servers run on their own event loop thread.
+
+The warmup runs are left out of the report and of the node metrics
+(--node-metrics), but they train the node latency estimates behind the
+pipeline priorities, as a long running service would.
+"""
+
+loglevel_defs = {
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "debug": logging.DEBUG,
+    "error": logging.ERROR,
+    "critical": logging.CRITICAL,
+    "fatal": logging.FATAL
+}
+
+
+def to_loglevel(x):
+    return loglevel_defs[x]
+
+
+class StubServers():
+    def __init__(self, servers):
+        self._servers = servers
+        self._loop = None
+        self._thread = None
+        self._runners = []
+
+    @staticmethod
+    def _handler(route):
+        status = route.get("status", 200)
+        delay = route.get("delay", 0)
+        headers = route.get("headers", {})
+        body = route.get("body")
+
+        async def handler(request):
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if isinstance(body, (dict, list)):
+                return web.json_response(body, status=status, headers=headers)
+            return web.Response(text="" if body is None else str(body),
+                                status=status, headers=headers)
+        return handler
+
+    async def _start(self):
+        for server in self._servers:
+            app = web.Application()
+            for route in server.get("routes", []):
+                app.router.add_route(route.get("method", "GET"),
+                                     route["path"], self._handler(route))
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, server.get("host", "127.0.0.1"),
+                              server["port"]).start()
+            self._runners.append(runner)
+
+    async def _stop(self):
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners = []
+
+    def start(self):
+        if len(self._servers) == 0:
+            return
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name="pyfreeflow-bench-stub",
+                                        daemon=True)
+        self._thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self._start(),
+                                             self._loop).result()
+        except BaseException:
+            self.stop()
+            raise
+
+    def stop(self):
+        if self._loop is None:
+            return
+
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+
+def percentile(samples, q):
+    # nearest rank
+    return samples[max(0, math.ceil(len(samples) * q) - 1)]
+
+
+class Bench():
+    def __init__(self, pipe, inputs, concurrency=1, rate=None, timeout=None):
+        self._pipe = pipe
+        self._inputs = inputs
+        self._concurrency = concurrency
+        self._rate = rate
+        self._timeout = timeout
+        self._latency = []
+        self._rc = {}
+
+    async def _run(self, data, scheduled):
+        try:
+            _, rc = await self._pipe.run(data, timeout=self._timeout)
+        except Exception as ex:
+            pyfreeflow.logger.error(ex)
+            rc = "exception"
+        self._latency.append(time.monotonic() - scheduled)
+        self._rc[str(rc)] = self._rc.get(str(rc), 0) + 1
+
+    async def _closed_loop(self, runs):
+        inputs = itertools.cycle(self._inputs)
+        runs = iter(range(runs))
+
+        async def worker():
+            for _ in runs:
+                await self._run(next(inputs), time.monotonic())
+
+        await asyncio.gather(*[worker() for _ in range(self._concurrency)])
+
+    async def _open_loop(self, runs):
+        loop = asyncio.get_running_loop()
+        inputs = itertools.cycle(self._inputs)
+        slots = asyncio.Semaphore(self._concurrency)
+        tasks = set()
+        start = time.monotonic()
+
+        async def run(data, scheduled):
+            try:
+                await self._run(data, scheduled)
+            finally:
+                slots.release()
+
+        for k in range(runs):
+            scheduled = start + k / self._rate
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await slots.acquire()
+            task = loop.create_task(run(next(inputs), scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        await asyncio.gather(*tasks)
+
+    async def run(self, runs, warmup=0):
+        if warmup > 0:
+            await self._closed_loop(warmup)
+            self._pipe.reset_metrics()
+        self._latency = []
+        self._rc = {}
+
+        monitor = LoopLagMonitor()
+        monitor.start()
+        start = time.monotonic()
+        if self._rate is None:
+            await self._closed_loop(runs)
+        else:
+            await self._open_loop(runs)
+        elapsed = time.monotonic() - start
+        lag = await monitor.stop()
+
+        return self.report(runs, elapsed, lag)
+
+    def report(self, runs, elapsed, lag):
+        samples = sorted(self._latency)
+        errors = sum(v for k, v in self._rc.items() if k != "0")
+        return {
+            "runs": runs,
+            "concurrency": self._concurrency,
+            "rate": self._rate,
+            "elapsed": elapsed,
+            "throughput": runs / elapsed if elapsed > 0 else 0.0,
+            "latency": {
+                "mean": sum(samples) / len(samples),
+                "p50": percentile(samples, 0.5),
+                "p90": percentile(samples, 0.9),
+                "p99": percentile(samples, 0.99),
+                "max": samples[-1],
+            } if len(samples) > 0 else None,
+            "rc": self._rc,
+            "error_rate": errors / runs if runs > 0 else 0.0,
+            "loop_lag": lag,
+        }
+
+
+def print_report(report):
+    print("runs: {r}, concurrency: {c}, rate: {t}".format(
+        r=report["runs"], c=report["concurrency"],
+        t=report["rate"] if report["rate"] is not None else "max"))
+    print("elapsed: {:.3f} s, throughput: {:.1f} runs/s".format(
+        report["elapsed"], report["throughput"]))
+    if report["latency"] is not None:
+        print("latency ms: " + ", ".join(
+            "{k} {v:.3f}".format(k=k, v=v * 1e3)
+            for k, v in report["latency"].items()))
+    print("rc: {r}, error rate: {e:.2%}".format(
+        r=", ".join("{k} {v}".format(k=k, v=v)
+                    for k, v in sorted(report["rc"].items())),
+        e=report["error_rate"]))
+    print("loop lag ms: " + ", ".join(
+        "{k} {v:.3f}".format(k=k, v=v * 1e3)
+        for k, v in report["loop_lag"].items() if k != "samples"))
+
+
+async def bench(argv):
+    argparser = argparse.ArgumentParser("pyfreeflow-bench")
+
+    argparser.add_argument("--config", "-c", dest="config", type=str,
+                           action="store", default="pyfreeflow.yaml",
+                           required=False, help="Pipeline configuration file")
+    argparser.add_argument("--runs", "-n", dest="runs", type=int,
+                           action="store", required=False,
+                           help="measured runs")
+    argparser.add_argument("--warmup", dest="warmup", type=int,
+                           action="store", required=False,
+                           help="runs before measuring")
+    argparser.add_argument("--concurrency", "-j", dest="concurrency",
+                           type=int, action="store", required=False,
+                           help="runs in flight")
+    argparser.add_argument("--rate", "-r", dest="rate", type=float,
+                           action="store", required=False,
+                           help="runs started per second")
+    argparser.add_argument("--timeout", "-t", dest="timeout", type=float,
+                           action="store", required=False,
+                           help="timeout of every run in seconds")
+    argparser.add_argument("--output", "-o", dest="output", type=str,
+                           action="store", required=False,
+                           help="JSON report file, - for stdout")
+    argparser.add_argument("--node-metrics", dest="node_metrics",
+                           action="store_true",
+                           help="add the node metrics to the JSON report")
+    argparser.add_argument("--loglevel", "-l", dest="loglevel", action="store",
+                           default="warning", type=str,
+                           choices=loglevel_defs.keys(), help="log level")
+
+    args = argparser.parse_args(argv)
+    pyfreeflow.set_loglevel(to_loglevel(args.loglevel))
+
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+
+    for ext in config.get("ext", []):
+        pyfreeflow.load_extension(ext)
+
+    for name, limit in config.get("resources", {}).items():
+        pyfreeflow.limiter.ResourceLimiter.register(name, limit)
+
+    assert ("pipeline" in config.keys())
+    conf = config.get("bench", {})
+
+    def option(name, default=None):
+        value = getattr(args, name)
+        return value if value is not None else conf.get(name, default)
+
+    params = {k: EnvVarParser.parse(v)
+              for k, v in config.get("args", {}).items()}
+    inputs = conf.get("inputs", [params])
+
+    servers = StubServers(conf.get("servers", []))
+    servers.start()
+
+    pipe = pyfreeflow.pipeline.Pipeline()
+    try:
+        await pipe.init(**config.get("pipeline"))
+        report = await Bench(pipe, inputs,
+                             concurrency=option("concurrency", 1),
+                             rate=option("rate"),
+                             timeout=option("timeout")).run(
+            option("runs", 100), warmup=option("warmup", 0))
+        if args.node_metrics:
+            report["nodes"] = pipe.metrics()
+    finally:
+        await pipe.fini()
+        servers.stop()
+
+    if args.output == "-":
+        print(json.dumps(report))
+    else:
+        print_report(report)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f)
+
+    return 0 if report["error_rate"] == 0 else 1
+
+
+def main(argv):
+    return asyncio.run(bench(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -81,6 +81,20 @@ async def cli(argv):
     argparser.add_argument("--logfile", "-g", dest="logfile", action="store",
                            required=False, type=str,
                            help="log file")
+    argparser.add_argument("--cache", dest="cache", action="store",
+                           required=False, type=str,
+                           help="persistent node result cache file")
+    argparser.add_argument("--metrics", dest="metrics", action="store",
+                           required=False, type=str,
+                           help="node metrics file, Prometheus text format")
+    argparser.add_argument("--trace", dest="trace", action="store",
+                           required=False, type=str,
+                           help="trace file, Chrome trace event format")
+    argparser.add_argument("--critical-path", dest="critical_path",
+                           action="store", required=False, type=float,
+                           nargs="?", const=20, metavar="PERCENT",
+                           help="print the critical path and the speedup of "
+                           "every node made PERCENT faster (default 20)")
 
     args = argparser.parse_args(argv)
     pyfreeflow.set_loglevel(to_loglevel(args.loglevel))
@@ -94,21 +108,37 @@ async def cli(argv):
     for ext in config.get("ext", []):
         pyfreeflow.load_extension(ext)
 
+    for name, limit in config.get("resources", {}).items():
+        pyfreeflow.limiter.ResourceLimiter.register(name, limit)
+
     assert ("pipeline" in config.keys())
     pipe = pyfreeflow.pipeline.Pipeline()
-    await pipe.init(**config.get("pipeline"))
+    pipeline_config = config.get("pipeline")
+    if args.cache:
+        pipeline_config = dict(pipeline_config, cache_path=args.cache)
+    await pipe.init(**pipeline_config)
 
     params = {k: EnvVarParser.parse(v) for k, v in config.get("args", {}).items()}
     rc = 0
+    tracer = pyfreeflow.trace.Tracer() if args.trace else None
 
     try:
-        output = await pipe.run(params)
+        output = await pipe.run(params, tracer=tracer)
         OUTPUT_FORMATTER[args.fmt](output[0], args.output)
         rc = 0 if output[1] == 0 else 1
     except Exception as ex:
         pyfreeflow.logger.error(ex)
         rc = 1
     finally:
+        if tracer is not None:
+            tracer.dump(args.trace)
+        if args.critical_path is not None and \
+                pipe.critical_path() is not None:
+            print(pipe.critical_path().text(args.critical_path),
+                  file=sys.stderr)
+        if args.metrics:
+            with open(args.metrics, "w") as f:
+                f.write(pipe.metrics_text())
         await pipe.fini()
 
     return rc
@@ -18,8 +18,12 @@ setup(
     packages=find_packages(where="src"),
     python_requires=">=3.8",
     install_requires=required_packages,
+    extras_require={
+        "graph": ["networkx>=3.2.1"],
+    },
     scripts= [
         "scripts/pyfreeflow-cli.py",
+        "scripts/pyfreeflow-bench.py",
     ],
     license="AGPL-3.0-or-later",
     classifiers=[
@@ -1,7 +1,12 @@
+import atexit
 import importlib
 import logging
+import logging.handlers
+import queue
 import pyfreeflow.ext
 import pyfreeflow.pipeline
+import pyfreeflow.limiter
+import pyfreeflow.trace
 from sys import version_info
 
 
@@ -14,10 +19,55 @@ else:
 
 handler.setFormatter(formatter)
 
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    SCALARS = (str, bytes, int, float, bool, type(None))
+
+    # the listener thread formats the record, the caller only enqueues it
+    def prepare(self, record):
+        args = record.args
+        # a single dict argument is stored as the args themselves
+        if isinstance(args, dict) or (args and not all(
+                isinstance(x, self.SCALARS) for x in args)):
+            # a mutable argument can change before the listener formats it
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # the traceback keeps the caller frames alive
+            record.exc_text = formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+log_queue = queue.SimpleQueue()
+listener = logging.handlers.QueueListener(log_queue, handler,
+                                          respect_handler_level=True)
+listening = False
+
+
+def _start_listener():
+    global listening
+    listener.start()
+    listening = True
+
+
+_start_listener()
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARNING)
 logger.propagate = True
-logger.addHandler(handler)
+logger.addHandler(LogQueueHandler(log_queue))
+
+
+def _stop_listener():
+    # flush the queued records
+    global listening
+    if listening:
+        listener.stop()
+        listening = False
+
+
+atexit.register(_stop_listener)
 
 
 def load_extension(ext_name):
@@ -31,8 +81,11 @@ def set_loglevel(level):
 
 
 def add_loghandler(handler):
+    # written by the listener thread, restarted to pick it up
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    _stop_listener()
+    listener.handlers = listener.handlers + (handler,)
+    _start_listener()
 
 
 def get_logformatter():
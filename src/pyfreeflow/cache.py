@@ -0,0 +1,324 @@
+from .utils import deepsizeof, DurationParser, EnvVarParser
+import aiosqlite
+import asyncio
+import collections
+import copy
+import json
+import logging
+import pickle
+import time
+import weakref
+import xxhash
+
+"""
+Node result cache configuration
+
+node:
+- name: "A"
+  type: "RestApiRequester"
+  version: "1.0"
+  cache:
+    max_entries: 1024  # Optional, default 1024
+    max_bytes: 10485760  # Optional, default unbounded
+    ttl: 60  # Optional, seconds or duration string ("1m30s"), default none
+    path: "cache.db"  # Optional, persist the results in a SQLite file
+    state: false  # Optional, add the run state to the key, default false
+  config: {}
+
+Entries are keyed by hash of the node input, and of the whole run state with
+state: true, for the nodes reading it: the other nodes keep changing the
+state, so it lowers the hit rate. DataTransformer nodes cannot be cached, a
+hit would not replay their state changes.
+
+Persistent entries are keyed by node name, hash of the node type, version
+and config, and hash of the input, so they survive process restarts and are
+not reused after a configuration change. Limits apply per node and are
+enforced by evicting the least recently used rows.
+"""
+
+
+class ResultCache():
+    def __init__(self, max_entries=1024, max_bytes=None, ttl=None,
+                 state=False):
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl = self.parse_ttl(ttl)
+        self._state = state
+
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0,
+                       "expirations": 0}
+
+    def __str__(self):
+        return "ResultCache(entries: {e}/{me}, bytes: {b}/{mb}, ttl: {t})".format(
+            e=len(self._entries), me=self._max_entries, b=self._bytes,
+            mb=self._max_bytes, t=self._ttl)
+
+    @staticmethod
+    def parse_ttl(ttl):
+        if isinstance(ttl, str):
+            return DurationParser.parse(ttl) / 1000000
+        return ttl
+
+    @staticmethod
+    def key(*args):
+        try:
+            raw = json.dumps(args, sort_keys=True, separators=(",", ":"),
+                             default=repr)
+        except (TypeError, ValueError):
+            return None
+        return xxhash.xxh3_128_hexdigest(raw.encode("utf-8"))
+
+    def node_key(self, state, data):
+        return self.key(state, data) if self._state else self.key(data)
+
+    @classmethod
+    def cacheable(cls, out):
+        if isinstance(out, list):
+            return all(cls.cacheable(x) for x in out)
+        return out is not None and out[1] == 0
+
+    @classmethod
+    def create(cls, node, path=None):
+        config = dict(node.get("cache"))
+        path = EnvVarParser.parse(config.pop("path", path))
+        if path is None:
+            return cls(**config)
+
+        return DiskResultCache(
+            path, node.get("name"),
+            cls.key(node.get("type"), node.get("version"),
+                    node.get("config", {})),
+            **config)
+
+    def _evict(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+
+        if entry[0] is not None and entry[0] < time.monotonic():
+            self._evict(key)
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return copy.deepcopy(entry[2])
+
+    async def put(self, key, value):
+        if key is None or not self.cacheable(value):
+            return
+
+        if key in self._entries:
+            self._evict(key)
+
+        size = deepsizeof(value)
+        if self._max_bytes is not None and size > self._max_bytes:
+            return
+
+        expire = time.monotonic() + self._ttl if self._ttl is not None \
+            else None
+        self._entries[key] = (expire, size, copy.deepcopy(value))
+        self._bytes += size
+
+        while len(self._entries) > self._max_entries or (
+                self._max_bytes is not None and self._bytes > self._max_bytes):
+            self._evict(next(iter(self._entries)))
+            self._stats["evictions"] += 1
+
+    async def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    async def close(self):
+        await self.clear()
+
+    def stats(self):
+        return dict(self._stats, entries=len(self._entries),
+                    bytes=self._bytes)
+
+
+class DiskResultCache(ResultCache):
+    STORE = {}
+    LOCK = weakref.WeakKeyDictionary()
+    LOGGER = logging.getLogger(".".join([__name__, "DiskResultCache"]))
+
+    SCHEMA = """
+      CREATE TABLE IF NOT EXISTS result_cache (
+        node TEXT NOT NULL,
+        config TEXT NOT NULL,
+        key TEXT NOT NULL,
+        expire REAL,
+        atime REAL NOT NULL,
+        size INTEGER NOT NULL,
+        value BLOB NOT NULL,
+        PRIMARY KEY (node, config, key)
+      );
+      CREATE INDEX IF NOT EXISTS result_cache_atime
+        ON result_cache (node, atime);
+    """
+
+    def __init__(self, path, node, config, max_entries=1024, max_bytes=None,
+                 ttl=None, state=False):
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes,
+                         ttl=ttl, state=state)
+        self._path = path
+        self._node = node
+        self._config = config
+        self._db = None
+
+    def __str__(self):
+        return "DiskResultCache(path: {p}, node: {n}, entries: {me}, bytes: {mb}, ttl: {t})".format(
+            p=self._path, n=self._node, me=self._max_entries,
+            mb=self._max_bytes, t=self._ttl)
+
+    @classmethod
+    def _lock(cls):
+        # an asyncio.Lock is bound to the first loop waiting on it, one lock
+        # for every loop
+        loop = asyncio.get_running_loop()
+        if loop not in cls.LOCK:
+            cls.LOCK[loop] = asyncio.Lock()
+        return cls.LOCK[loop]
+
+    @classmethod
+    async def _open(cls, path):
+        async with cls._lock():
+            if path not in cls.STORE.keys():
+                db = await aiosqlite.connect(path)
+                try:
+                    await db.executescript(cls.SCHEMA)
+                    await db.commit()
+                except BaseException:
+                    await db.close()
+                    raise
+                cls.STORE[path] = {"db": db, "refs": 0}
+            cls.STORE[path]["refs"] += 1
+            return cls.STORE[path]["db"]
+
+    @classmethod
+    async def _close(cls, path):
+        async with cls._lock():
+            if path not in cls.STORE.keys():
+                return
+            cls.STORE[path]["refs"] -= 1
+            if cls.STORE[path]["refs"] == 0:
+                await cls.STORE.pop(path)["db"].close()
+
+    async def _ensure_db(self):
+        if self._db is None:
+            self._db = await self._open(self._path)
+        return self._db
+
+    async def get(self, key):
+        where = (self._node, self._config, key)
+
+        try:
+            db = await self._ensure_db()
+            async with db.execute(
+                    "SELECT expire, value FROM result_cache " +
+                    "WHERE node = ? AND config = ? AND key = ?",
+                    where) as cur:
+                row = await cur.fetchone()
+
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+
+            now = time.time()
+            if row[0] is not None and row[0] < now:
+                await db.execute(
+                    "DELETE FROM result_cache " +
+                    "WHERE node = ? AND config = ? AND key = ?", where)
+                await db.commit()
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+
+            await db.execute(
+                "UPDATE result_cache SET atime = ? " +
+                "WHERE node = ? AND config = ? AND key = ?", (now,) + where)
+            await db.commit()
+            value = pickle.loads(row[1])
+        except (aiosqlite.Error, pickle.UnpicklingError) as ex:
+            self.LOGGER.error("cannot read %s: %s", self._path, ex)
+            self._stats["misses"] += 1
+            return None
+
+        self._stats["hits"] += 1
+        return value
+
+    async def _shrink(self, db):
+        async with db.execute(
+                "SELECT count(*), coalesce(sum(size), 0) FROM result_cache " +
+                "WHERE node = ?", (self._node,)) as cur:
+            entries, size = await cur.fetchone()
+
+        if entries <= self._max_entries and (
+                self._max_bytes is None or size <= self._max_bytes):
+            return
+
+        evict = []
+        async with db.execute(
+                "SELECT rowid, size FROM result_cache WHERE node = ? " +
+                "ORDER BY atime", (self._node,)) as cur:
+            async for rowid, row_size in cur:
+                if entries <= self._max_entries and (
+                        self._max_bytes is None or size <= self._max_bytes):
+                    break
+                evict.append((rowid,))
+                entries -= 1
+                size -= row_size
+
+        await db.executemany("DELETE FROM result_cache WHERE rowid = ?",
+                             evict)
+        self._stats["evictions"] += len(evict)
+
+    async def put(self, key, value):
+        if key is None or not self.cacheable(value):
+            return
+
+        try:
+            raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as ex:
+            self.LOGGER.warning("cannot store %s result: %s", self._node, ex)
+            return
+
+        if self._max_bytes is not None and len(raw) > self._max_bytes:
+            return
+
+        now = time.time()
+        expire = now + self._ttl if self._ttl is not None else None
+
+        try:
+            db = await self._ensure_db()
+            await db.execute(
+                "INSERT OR REPLACE INTO result_cache " +
+                "(node, config, key, expire, atime, size, value) " +
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._node, self._config, key, expire, now, len(raw), raw))
+            await self._shrink(db)
+            await db.commit()
+        except aiosqlite.Error as ex:
+            self.LOGGER.error("cannot write %s: %s", self._path, ex)
+
+    async def clear(self):
+        db = await self._ensure_db()
+        await db.execute("DELETE FROM result_cache WHERE node = ?",
+                         (self._node,))
+        await db.commit()
+
+    async def close(self):
+        if self._db is not None:
+            self._db = None
+            await self._close(self._path)
+
+    def stats(self):
+        return dict(self._stats, path=self._path)
@@ -0,0 +1,139 @@
+"""
+Critical path and slack of a pipeline run.
+
+The report is computed from the execution plan and the node start and end
+times of the last completed run, with the critical path method: the edges are
+finish to start dependencies and every node lasts as long as it did in that
+run.
+
+makespan      end of the last node, the shortest run time the graph allows
+              with the recorded node durations
+critical_path chain of nodes without slack that determines the makespan
+slack         time a node can be delayed, or take longer, without
+              delaying the run
+speedup       run time ratio when the node alone gets improvement % faster
+
+Waits on max_concurrency, resource classes and connection pools are not part
+of the model: the gap between the observed run time and the makespan, and
+the observed node wait (start minus end of the last predecessor), show them.
+Piped streaming nodes run along with their producer, the model serializes
+them.
+"""
+
+
+class CriticalPath():
+    def __init__(self, plan, origin, end, timing):
+        self._plan = plan
+        self._observed = end - origin
+
+        n = len(plan)
+        self._start = [None] * n
+        self._duration = [0.0] * n
+        for i, t in enumerate(timing):
+            if t is not None:
+                self._start[i] = t[0] - origin
+                self._duration[i] = max(0.0, t[1] - t[0])
+
+        self._est, self._eft = self._forward(self._duration)
+        self._makespan = max(self._eft, default=0.0)
+        self._lft = self._backward()
+        self._eps = 1e-9 + self._makespan * 1e-6
+
+    def __str__(self):
+        return "CriticalPath(nodes: {n}, makespan: {m:.6f})".format(
+            n=len(self._plan), m=self._makespan)
+
+    def _forward(self, duration):
+        plan = self._plan
+        est = [0.0] * len(plan)
+        eft = [0.0] * len(plan)
+        for i in range(len(plan)):
+            est[i] = max((eft[p] for p in plan.pred[i]), default=0.0)
+            eft[i] = est[i] + duration[i]
+        return est, eft
+
+    def _backward(self):
+        plan = self._plan
+        lft = [self._makespan] * len(plan)
+        for i in reversed(range(len(plan))):
+            lft[i] = min((lft[j] - self._duration[j] for j in plan.succ[i]),
+                         default=self._makespan)
+        return lft
+
+    def makespan(self, duration=None):
+        if duration is None:
+            return self._makespan
+        return max(self._forward(duration)[1], default=0.0)
+
+    def slack(self, i):
+        return max(0.0, self._lft[i] - self._eft[i])
+
+    def path(self):
+        plan = self._plan
+        if len(plan) == 0:
+            return []
+
+        i = max(range(len(plan)), key=lambda x: self._eft[x])
+        path = [i]
+        while len(plan.pred[i]) > 0:
+            i = max(plan.pred[i], key=lambda x: self._eft[x])
+            path.append(i)
+        return [plan.names[x] for x in reversed(path)]
+
+    def speedup(self, i, improvement):
+        if self._duration[i] == 0.0:
+            return 1.0
+
+        duration = list(self._duration)
+        duration[i] *= 1.0 - improvement / 100.0
+        makespan = self.makespan(duration)
+        return self._makespan / makespan if makespan > 0.0 else 1.0
+
+    def _wait(self, i):
+        if self._start[i] is None:
+            return None
+        ready = max((self._start[p] + self._duration[p]
+                     for p in self._plan.pred[i]
+                     if self._start[p] is not None), default=0.0)
+        return max(0.0, self._start[i] - ready)
+
+    def report(self, improvement=20):
+        plan = self._plan
+        critical = set(self.path())
+        return {
+            "observed": self._observed,
+            "makespan": self._makespan,
+            "critical_path": self.path(),
+            "improvement": improvement,
+            "nodes": {
+                n: {
+                    "start": self._start[i],
+                    "duration": self._duration[i],
+                    "wait": self._wait(i),
+                    "slack": self.slack(i),
+                    "critical": n in critical,
+                    "speedup": self.speedup(i, improvement),
+                } for i, n in enumerate(plan.names)
+            },
+        }
+
+    def text(self, improvement=20):
+        report = self.report(improvement)
+        lines = [
+            "observed run: {:.3f} ms, makespan: {:.3f} ms".format(
+                report["observed"] * 1e3, report["makespan"] * 1e3),
+            "critical path: {}".format(" -> ".join(report["critical_path"])),
+            "{:<24} {:>12} {:>12} {:>12} {:>10}".format(
+                "node", "duration ms", "wait ms", "slack ms",
+                "x{:g}%".format(improvement)),
+        ]
+
+        nodes = sorted(report["nodes"].items(),
+                       key=lambda x: (-x[1]["speedup"], x[1]["slack"]))
+        for n, x in nodes:
+            lines.append("{:<24} {:>12.3f} {:>12} {:>12.3f} {:>10.4f}{}".format(
+                n, x["duration"] * 1e3,
+                "{:.3f}".format(x["wait"] * 1e3) if x["wait"] is not None
+                else "-",
+                x["slack"] * 1e3, x["speedup"], " *" if x["critical"] else ""))
+        return "\n".join(lines)
@@ -30,7 +30,7 @@ class JsonBufferOperatorV1_0(FreeFlowExt):
             return None, 101
 
         try:
-            j = json.loads(raw)
+            j = await self.offload(json.loads, raw)
             return j, 0
         except Exception as ex:
             self._logger.error("Cannot load json data '{}' {}".format(raw, ex))
@@ -42,7 +42,7 @@ class JsonBufferOperatorV1_0(FreeFlowExt):
             return None, 101
 
         try:
-            j = json.dumps(raw)
+            j = await self.offload(json.dumps, raw)
             return j, 0
         except Exception as ex:
             self._logger.error("Cannot write json data '{}' {}".format(
@@ -77,7 +77,7 @@ class YamlBufferOperatorV1_0(FreeFlowExt):
             return None, 101
 
         try:
-            j = yaml.safe_load(raw)
+            j = await self.offload(yaml.safe_load, raw)
             return j, 0
         except Exception as ex:
             self._logger.error("Cannot write yaml data '{}' {}".format(
@@ -90,7 +90,7 @@ class YamlBufferOperatorV1_0(FreeFlowExt):
             return None, 101
 
         try:
-            j = yaml.safe_dump(raw)
+            j = await self.offload(yaml.safe_dump, raw)
             return j, 0
         except Exception as ex:
             self._logger.error("Cannot write yaml data '{}' {}".format(
@@ -131,7 +131,7 @@ if version_info.major > 3 or (version_info.major == 3 and
                 return None, 101
 
             try:
-                j = tomllib.loads(raw)
+                j = await self.offload(tomllib.loads, raw)
                 return j, 0
             except Exception as ex:
                 self._logger.error("Invalid input format '{}' {}".format(
@@ -145,7 +145,7 @@ if version_info.major > 3 or (version_info.major == 3 and
                 return None, 101
 
             try:
-                j = tomli_w.dumps(raw)
+                j = await self.offload(tomli_w.dumps, raw)
                 return j, 0
             except Exception as ex:
                 self._logger.error("Invalid input format '{}' {}".format(
@@ -28,12 +28,12 @@ class FernetCryptoOperatorV1_0(FreeFlowExt):
 
     async def _enc(self, data, key):
         cipher = await self._read_key(key)
-        d = cipher.encrypt(data.encode("utf-8"))
+        d = await self.offload(cipher.encrypt, data.encode("utf-8"))
         return d.decode("utf-8"), 0
 
     async def _dec(self, data, key):
         cipher = await self._read_key(key)
-        d = cipher.decrypt(data.encode("utf-8"))
+        d = await self.offload(cipher.decrypt, data.encode("utf-8"))
         return d.decode("utf-8"), 0
 
     async def do(self, state, data):
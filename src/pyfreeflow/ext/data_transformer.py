@@ -4,6 +4,8 @@ import datetime as dt
 import xxhash
 import json
 import asyncio
+import copy
+import threading
 from decimal import Decimal
 from cryptography.fernet import Fernet
 from ..utils import deepupdate, DurationParser, EnvVarParser, DateParser
@@ -41,6 +43,7 @@ class DataTransformerV1_0(FreeFlowExt):
         self._userdefined = userdefined
         self._force = force
         self._env = self._create_safe_lua_env()
+        self._lock = threading.Lock()
         self._logger = logging.getLogger(".".join([__name__, self.__typename__,
                                                    self._name]))
 
@@ -54,11 +57,11 @@ class DataTransformerV1_0(FreeFlowExt):
             "from": self._fromjson,
         })
         self._env.globals().safe_env["logger"] = self._py_to_lua({
-            "error": lambda a: self._logger.error(self._lua_to_py(a)),
-            "warning": lambda a: self._logger.warning(self._lua_to_py(a)),
-            "info": lambda a: self._logger.info(self._lua_to_py(a)),
-            "debug": lambda a: self._logger.debug(self._lua_to_py(a)),
-            "critical": lambda a: self._logger.critical(self._lua_to_py(a)),
+            "error": lambda a: self._log(logging.ERROR, a),
+            "warning": lambda a: self._log(logging.WARNING, a),
+            "info": lambda a: self._log(logging.INFO, a),
+            "debug": lambda a: self._log(logging.DEBUG, a),
+            "critical": lambda a: self._log(logging.CRITICAL, a),
         })
 
         if secret is not None:
@@ -67,8 +70,12 @@ class DataTransformerV1_0(FreeFlowExt):
             self._env.globals().safe_env["encrypt"] = self._encrypt
             self._env.globals().safe_env["decrypt"] = self._decrypt
 
+        self._transformer = self._compile(transformer)
+
+    def _compile(self, transformer):
+        f = None
         try:
-            self._transformer = self._env.globals().eval_safe(
+            f = self._env.globals().eval_safe(
                 "\n".join(["function f(state, data)",
                            transformer,
                            "return state, data",
@@ -76,7 +83,13 @@ class DataTransformerV1_0(FreeFlowExt):
         except Exception as ex:
             self._logger.error(ex)
 
-        assert (self._transformer is not None)
+        assert (f is not None)
+        return f
+
+    @classmethod
+    def fuse(cls, name, stages, force=False, max_tasks=4):
+        return FusedDataTransformerV1_0(name, stages, force=force,
+                                        max_tasks=max_tasks)
 
     def __str__(self):
         return "{typ}(name: {n}, version: {v})".format(
@@ -414,6 +427,11 @@ class DataTransformerV1_0(FreeFlowExt):
     def _decrypt(self, value):
         return self._cipher.decrypt(value).decode("utf-8")
 
+    def _log(self, level, a):
+        # skip the table conversion when the level is disabled
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, self._lua_to_py(a))
+
     def _lua_null_to_none(self, x):
         return str(x) == "null"
 
@@ -448,6 +466,18 @@ class DataTransformerV1_0(FreeFlowExt):
         else:
             return a
 
+    def _snapshot(self, state):
+        # the other nodes keep updating the run state on the loop while a
+        # worker thread converts it
+        return copy.deepcopy(state) if self._executor is not None else state
+
+    def _transform(self, state, data):
+        # the lua runtime is shared by the concurrent runs of the node
+        with self._lock:
+            s, d = self._transformer(self._py_to_lua(state),
+                                     self._py_to_lua(data))
+            return self._lua_to_py(s), self._lua_to_py(d)
+
     async def run(self, state, data=({}, 0)):
         if isinstance(data, list):
             _data = [x[0] for x in data if x[1] == 0]
@@ -461,13 +491,11 @@ class DataTransformerV1_0(FreeFlowExt):
 
         try:
             start = asyncio.get_event_loop().time()
-            s, d = self._transformer(self._py_to_lua(state),
-                                     self._py_to_lua(_data))
-
-            s = self._lua_to_py(s)
-            d = self._lua_to_py(d)
+            async with self._resource:
+                s, d = await self.offload(self._transform,
+                                          self._snapshot(state), _data)
             stop = asyncio.get_event_loop().time()
-            self._logger.debug("transformation took {} s".format(stop - start))
+            self._logger.debug("transformation took %s s", stop - start)
 
             deepupdate(state, s)
             if not self._userdefined:
@@ -478,3 +506,131 @@ class DataTransformerV1_0(FreeFlowExt):
         except Exception as ex:
             self._logger.error(ex)
             return state, (None, 101)
+
+
+FUSE_LUA = """
+function(stages, null, array_mt, map_mt)
+  local normalize
+  -- same values as a round trip through python, see _lua_to_py/_py_to_lua
+  normalize = function(a)
+    if type(a) ~= "table" then
+      if a == nil then
+        return null
+      end
+      return a
+    end
+
+    local mt = getmetatable(a)
+    if mt == "null" then
+      return null
+    end
+
+    local r
+    if mt == "array" then
+      r = setmetatable({}, array_mt)
+      local n = 0
+      for _, v in pairs(a) do
+        n = n + 1
+        r[n] = normalize(v)
+      end
+    else
+      r = setmetatable({}, map_mt)
+      for k, v in pairs(a) do
+        r[k] = normalize(v)
+      end
+    end
+    return r
+  end
+
+  local ismap = function(a)
+    if type(a) ~= "table" then
+      return false
+    end
+    local mt = getmetatable(a)
+    return mt == nil or mt == "map"
+  end
+
+  local deepupdate
+  deepupdate = function(base, other)
+    if not ismap(base) or not ismap(other) then
+      error("state update of a non map value", 0)
+    end
+    for k, v in pairs(other) do
+      if base[k] == nil or not ismap(v) then
+        base[k] = v
+      else
+        deepupdate(base[k], v)
+      end
+    end
+  end
+
+  return function(state, data)
+    for i, stage in ipairs(stages) do
+      local ok, s, d = pcall(stage, normalize(state), data)
+      if ok then
+        ok, s = pcall(deepupdate, state, normalize(s))
+        data = normalize(d)
+      end
+      if not ok then
+        return i, tostring(s), state, null
+      end
+    end
+    return nil, nil, state, data
+  end
+end
+"""
+
+
+class FusedDataTransformerV1_0(DataTransformerV1_0):
+    # built by Pipeline.init from a linear chain of DataTransformer nodes,
+    # not registered: DataTransformer 1.0 is the parent class
+    def __init__(self, name, stages, force=False, max_tasks=4):
+        super().__init__(name, transformer=stages[0][1], force=force,
+                         max_tasks=max_tasks)
+        self._stages = [x[0] for x in stages]
+
+        fuse = self._env.eval(FUSE_LUA)
+        self._transformer = fuse(
+            self._env.table_from([self._compile(x[1]) for x in stages]),
+            self._env.globals().safe_env["null"],
+            self._env.globals()["array_mt"],
+            self._env.globals()["map_mt"])
+
+    def __str__(self):
+        return "{typ}(name: {n}, version: {v}, stages: {s})".format(
+            typ=self.__typename__, n=self._name, v=self.__version__,
+            s=self._stages)
+
+    def _transform(self, state, data):
+        with self._lock:
+            failed, err, s, d = self._transformer(self._py_to_lua(state),
+                                                  self._py_to_lua(data))
+            return failed, err, self._lua_to_py(s), self._lua_to_py(d)
+
+    async def run(self, state, data=({}, 0)):
+        if isinstance(data, list):
+            _data = [x[0] for x in data if x[1] == 0]
+            err = len(_data) == 0
+        else:
+            _data = data[0]
+            err = data[1] != 0
+
+        if err and not self._force:
+            return state, (None, 103)
+
+        try:
+            async with self._resource:
+                failed, err, s, d = await self.offload(
+                    self._transform, self._snapshot(state), _data)
+        except Exception as ex:
+            self._logger.error(ex)
+            return state, (None, 101)
+
+        # the stages before the failed one updated the state, the following
+        # ones saw a failed input, as if they were not fused
+        deepupdate(state, s)
+        if failed is None:
+            return state, (d, 0)
+
+        self._logger.error("stage '%s': %s", self._stages[failed - 1], err)
+        return state, (None, 101 if failed == len(self._stages) else 103)
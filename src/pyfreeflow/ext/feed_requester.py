@@ -10,7 +10,7 @@ import logging
 import urllib.parse
 import re
 import random
-from ..utils import MimeTypeParser, SecureXMLParser, DateParser
+from ..utils import MimeTypeParser, SecureXMLParser, DateParser, Deadline
 
 __TYPENAME__ = "FeedRequester"
 
@@ -334,8 +334,8 @@ class FeedRequesterV1_0(FreeFlowExt):
 
     async def _on_request_end(self, session, trace_config_ctx, params):
         elapsed = asyncio.get_event_loop().time() - trace_config_ctx.start
-        self._logger.debug("Request to {} took {} s".format(trace_config_ctx.url,
-                                                          elapsed))
+        self._logger.debug("Request to %s took %s s", trace_config_ctx.url,
+                           elapsed)
 
     async def _ensure_session(self) -> aiohttp.ClientSession:
         if self._session is None or self._session.closed:
@@ -473,6 +473,19 @@ class FeedRequesterV1_0(FreeFlowExt):
 
         return rdf
 
+    def _parse_feed(self, body):
+        body = self._sanitize_feed(body)
+        if "rss" in body.keys():
+            body = self._rss_parser2(
+                body.get("rss").get("elem").get("channel"))
+        elif "{http://www.w3.org/2005/Atom}feed" in body.keys():
+            body = self._atom_parser2(
+                body.get("{http://www.w3.org/2005/Atom}feed"))
+        elif "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}RDF" in body.keys():
+            body = self._rdf_parser2(
+                body.get("{http://www.w3.org/1999/02/22-rdf-syntax-ns#}RDF"))
+        return body
+
     async def _try_request(self, method, url, headers, params, data):
         sleep = 0
         max_sleep = int(self._max_retry_sleep / self._max_retries)
@@ -480,10 +493,18 @@ class FeedRequesterV1_0(FreeFlowExt):
             try:
                 resp = await self._session.request(
                         method, url, headers=headers, params=params, data=data,
-                        ssl=self._ssl_context, allow_redirects=True)
+                        ssl=self._ssl_context, allow_redirects=True,
+                        timeout=aiohttp.ClientTimeout(
+                            total=Deadline.clamp(self._timeout)))
                 return resp
             except aiohttp.ClientError as ex:
                 sleep = random.randint(sleep + 1, i * max_sleep)
+                remaining = Deadline.remaining()
+                if remaining is not None and sleep >= remaining:
+                    self._logger.warning(
+                        "error connecting '%s' try %d/%d no time left " +
+                        "to retry: %s", url, i, self._max_retries, ex)
+                    break
                 self._logger.warning(
                     f"error connecting '{url}' " +
                     f"try {i}/{self._max_retries} retry in {sleep}s: {ex}")
@@ -563,7 +584,7 @@ class FeedRequesterV1_0(FreeFlowExt):
                                 resp._request_info._asdict()).items()}
 
             try:
-                body = self._parse_resp(resp, raw, url)
+                body = await self.offload(self._parse_resp, resp, raw, url)
                 resp.release()
             except Exception as ex:
                 self._logger.error("feed load %s error: %s", url, ex)
@@ -573,16 +594,7 @@ class FeedRequesterV1_0(FreeFlowExt):
                      "headers": dict(resp.headers), "body": {}}, 106)
 
             try:
-                body = self._sanitize_feed(body)
-                if "rss" in body.keys():
-                    body = self._rss_parser2(
-                        body.get("rss").get("elem").get("channel"))
-                elif "{http://www.w3.org/2005/Atom}feed" in body.keys():
-                    body = self._atom_parser2(
-                        body.get("{http://www.w3.org/2005/Atom}feed"))
-                elif "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}RDF" in body.keys():
-                    body = self._rdf_parser2(
-                        body.get("{http://www.w3.org/1999/02/22-rdf-syntax-ns#}RDF"))
+                body = await self.offload(self._parse_feed, body)
 
                 return (
                     {"req": req_info, "redirect": redirect,
@@ -58,6 +58,40 @@ class AnyFileOperatorV1_0(FreeFlowExt):
         rval = await self._action[op](path, raw)
         return state, rval
 
+    async def stream(self, state, data):
+        # writes of the same path are appended to the file opened by the
+        # first one, reads go through do()
+        files = {}
+        try:
+            async for item in data:
+                if item[1] != 0 or item[0].get("op", "read") != "write":
+                    state, out = await self.run(state, item)
+                    yield out
+                    continue
+
+                raw = item[0].get("data", {})
+                path = item[0].get("path")
+                if self._mode == "b" and isinstance(raw, str):
+                    raw_ = raw.encode("utf-8")
+                else:
+                    raw_ = raw
+
+                try:
+                    # one slot of the node resource class for every write
+                    async with self._resource:
+                        if path not in files.keys():
+                            files[path] = await aiofiles.open(
+                                path, "w" + self._mode)
+                        await files[path].write(raw_)
+                    yield raw, 0
+                except Exception as ex:
+                    self._logger.error("Cannot write file '{}' {}".format(
+                        path, ex))
+                    yield raw, 103
+        finally:
+            for f in files.values():
+                await f.close()
+
 
 class JsonFileOperatorV1_0(FreeFlowExt):
     __typename__ = __JSON_TYPENAME__
@@ -10,7 +10,7 @@ import logging
 import re
 import random
 import urllib.parse
-from ..utils import MimeTypeParser, SecureXMLParser
+from ..utils import MimeTypeParser, SecureXMLParser, Deadline
 
 __TYPENAME__ = "HtmlRequester"
 
@@ -89,8 +89,8 @@ class HtmlRequesterV1_0(FreeFlowExt):
 
     async def _on_request_end(self, session, trace_config_ctx, params):
         elapsed = asyncio.get_event_loop().time() - trace_config_ctx.start
-        self._logger.debug("Request to {} took {} s".format(trace_config_ctx.url,
-                                                          elapsed))
+        self._logger.debug("Request to %s took %s s", trace_config_ctx.url,
+                           elapsed)
 
     async def _ensure_session(self) -> aiohttp.ClientSession:
         if self._session is None or self._session.closed:
@@ -144,10 +144,18 @@ class HtmlRequesterV1_0(FreeFlowExt):
             try:
                 resp = await self._session.request(
                         method, url, headers=headers, params=params, data=data,
-                        ssl=self._ssl_context, allow_redirects=True)
+                        ssl=self._ssl_context, allow_redirects=True,
+                        timeout=aiohttp.ClientTimeout(
+                            total=Deadline.clamp(self._timeout)))
                 return resp
             except aiohttp.ClientError as ex:
                 sleep = random.randint(sleep + 1, i * max_sleep)
+                remaining = Deadline.remaining()
+                if remaining is not None and sleep >= remaining:
+                    self._logger.warning(
+                        "error connecting '%s' try %d/%d no time left " +
+                        "to retry: %s", url, i, self._max_retries, ex)
+                    break
                 self._logger.warning(
                     f"error connecting '{url}' " +
                     f"try {i}/{self._max_retries} retry in {sleep}s: {ex}")
@@ -194,8 +202,9 @@ class HtmlRequesterV1_0(FreeFlowExt):
                 mimetype = self._split_mimetype(
                     resp.headers.get("Content-Type"))
                 if MimeTypeParser.is_html(mimetype.get("type")):
-                    body = SecureXMLParser.parse_string(raw.decode(
-                        mimetype.get("charset", "utf-8")), html=True)
+                    body = await self.offload(
+                        SecureXMLParser.parse_string, raw.decode(
+                            mimetype.get("charset", "utf-8")), html=True)
                 else:
                     self._logger.warning(
                         "aiohttp request %s warning: response type '%s'",
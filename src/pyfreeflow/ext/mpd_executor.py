@@ -2,6 +2,7 @@ from .types import FreeFlowExt
 import asyncio
 import re
 import logging
+from ..trace import span
 from ..utils import EnvVarParser
 
 __TYPENAME__ = "MpdExecutor"
@@ -102,34 +103,36 @@ class ConnectionPool():
             return None
 
         lock = cls.CLIENT[client_name]["lock"]
-        cls.LOGGER.debug("GET {} Lock[{}/{}/{}] Queue[{}]".format(
+        cls.LOGGER.debug("GET %s Lock[%d/%d/%d] Queue[%d]",
             client_name, len(lock._waiters) if lock._waiters else 0,
             lock._value, lock._bound_value,
-            cls.POOL[client_name].qsize()))
-        await lock.acquire()
+            cls.POOL[client_name].qsize())
+        with span("ConnectionPool.wait", "pool", client=client_name):
+            await lock.acquire()
 
         try:
             while not cls.POOL[client_name].empty():
                 conn = await cls.POOL[client_name].get()
                 if await cls.is_alive(conn):
                     return conn
-        except Exception as ex:
+
+            conninfo = cls.CLIENT[client_name]["conninfo"]
+            with span("ConnectionPool.connect", "pool", client=client_name):
+                return await MpdConnection.open(conninfo)
+        except BaseException as ex:
             lock.release()
             raise ex
 
-        conninfo = cls.CLIENT[client_name]["conninfo"]
-        return await MpdConnection.open(conninfo)
-
     @classmethod
     async def release(cls, client_name, conn):
         if client_name in cls.CLIENT.keys():
             lock = cls.CLIENT[client_name]["lock"]
             await cls.POOL[client_name].put(conn)
             lock.release()
-            cls.LOGGER.debug("RELEASE {} Lock[{}/{}/{}] Queue[{}]".format(
+            cls.LOGGER.debug("RELEASE %s Lock[%d/%d/%d] Queue[%d]",
                 client_name, len(lock._waiters) if lock._waiters else 0,
                 lock._value, lock._bound_value,
-                cls.POOL[client_name].qsize()))
+                cls.POOL[client_name].qsize())
         else:
             await MpdConnection.close(conn)
 
@@ -3,7 +3,8 @@ import psycopg
 import asyncio
 from cryptography.fernet import Fernet
 import logging
-from ..utils import EnvVarParser
+from ..trace import span
+from ..utils import EnvVarParser, Deadline
 
 __TYPENAME__ = "PgSqlExecutor"
 
@@ -56,34 +57,36 @@ class ConnectionPool():
             return None
 
         lock = cls.CLIENT[client_name]["lock"]
-        cls.LOGGER.debug("GET {} Lock[{}/{}/{}] Queue[{}]".format(
+        cls.LOGGER.debug("GET %s Lock[%d/%d/%d] Queue[%d]",
             client_name, len(lock._waiters) if lock._waiters else 0,
             lock._value, lock._bound_value,
-            cls.POOL[client_name].qsize()))
-        await lock.acquire()
+            cls.POOL[client_name].qsize())
+        with span("ConnectionPool.wait", "pool", client=client_name):
+            await lock.acquire()
 
         try:
             while not cls.POOL[client_name].empty():
                 conn = await cls.POOL[client_name].get()
                 if await cls.is_alive(conn):
                     return conn
-        except psycopg.errors.Error as ex:
+
+            conninfo = cls.CLIENT[client_name]["conninfo"]
+            with span("ConnectionPool.connect", "pool", client=client_name):
+                return await psycopg.AsyncConnection.connect(conninfo)
+        except BaseException as ex:
             lock.release()
             raise ex
 
-        conninfo = cls.CLIENT[client_name]["conninfo"]
-        return await psycopg.AsyncConnection.connect(conninfo)
-
     @classmethod
     async def release(cls, client_name, conn):
         if client_name in cls.CLIENT.keys():
             lock = cls.CLIENT[client_name]["lock"]
             await cls.POOL[client_name].put(conn)
             lock.release()
-            cls.LOGGER.debug("RELEASE {} Lock[{}/{}/{}] Queue[{}]".format(
+            cls.LOGGER.debug("RELEASE %s Lock[%d/%d/%d] Queue[%d]",
                 client_name, len(lock._waiters) if lock._waiters else 0,
                 lock._value, lock._bound_value,
-                cls.POOL[client_name].qsize()))
+                cls.POOL[client_name].qsize())
         else:
             await conn.close()
 
@@ -187,7 +190,12 @@ class PgSqlExecutorV1_0(FreeFlowExt):
                 placeholder = data.get("placeholder", {})
 
                 stm = self._stm.format(**placeholder)
-                self._logger.debug(f"executing statement: {stm}")
+                self._logger.debug("executing statement: %s", stm)
+
+                remaining = Deadline.remaining()
+                if remaining is not None:
+                    await cur.execute("SET LOCAL statement_timeout = {}".format(
+                        max(1, int(remaining * 1000))))
 
                 if value is not None:
                     if value and isinstance(value, list) and len(value) > 0:
@@ -201,6 +209,11 @@ class PgSqlExecutorV1_0(FreeFlowExt):
                     rs["resultset"] = await cur.fetchall()
 
                 await conn.commit()
+        except psycopg.errors.QueryCanceled as ex:
+            rc = 104
+            if not conn.closed:
+                await conn.rollback()
+            self._logger.error(ex)
         except psycopg.errors.Error as ex:
             rc = 102
             if not conn.closed:
@@ -9,7 +9,7 @@ import asyncio
 import logging
 import random
 import urllib.parse
-from ..utils import MimeTypeParser, SecureXMLParser, EnvVarParser
+from ..utils import MimeTypeParser, SecureXMLParser, EnvVarParser, Deadline
 
 __TYPENAME__ = "RestApiRequester"
 
@@ -89,8 +89,8 @@ class RestApiRequesterV1_0(FreeFlowExt):
 
     async def _on_request_end(self, session, trace_config_ctx, params):
         elapsed = asyncio.get_event_loop().time() - trace_config_ctx.start
-        self._logger.debug("Request to {} took {} s".format(trace_config_ctx.url,
-                                                          elapsed))
+        self._logger.debug("Request to %s took %s s", trace_config_ctx.url,
+                           elapsed)
 
     async def _ensure_session(self) -> aiohttp.ClientSession:
         if self._session is None or self._session.closed:
@@ -144,10 +144,18 @@ class RestApiRequesterV1_0(FreeFlowExt):
             try:
                 resp = await self._session.request(
                         method, url, headers=headers, params=params, data=data,
-                        ssl=self._ssl_context, allow_redirects=True)
+                        ssl=self._ssl_context, allow_redirects=True,
+                        timeout=aiohttp.ClientTimeout(
+                            total=Deadline.clamp(self._timeout)))
                 return resp
             except aiohttp.ClientError as ex:
                 sleep = random.randint(sleep + 1, i * max_sleep)
+                remaining = Deadline.remaining()
+                if remaining is not None and sleep >= remaining:
+                    self._logger.warning(
+                        "error connecting '%s' try %d/%d no time left " +
+                        "to retry: %s", url, i, self._max_retries, ex)
+                    break
                 self._logger.warning(
                     f"error connecting '{url}' " +
                     f"try {i}/{self._max_retries} retry in {sleep}s: {ex}")
@@ -193,11 +201,12 @@ class RestApiRequesterV1_0(FreeFlowExt):
                     resp.headers.get("Content-Type"))
                 if MimeTypeParser.is_json(mimetype.get(
                         "type", "application/json")):
-                    body = json.loads(raw.decode(
+                    body = await self.offload(json.loads, raw.decode(
                         mimetype.get("charset", "utf-8")))
                 elif MimeTypeParser.is_xml(mimetype):
-                    body = SecureXMLParser.parse_bytes(
-                        raw, max_size=self._max_resp_size)
+                    body = await self.offload(
+                        SecureXMLParser.parse_bytes, raw,
+                        max_size=self._max_resp_size)
                 else:
                     body = {}
                 resp.release()
@@ -28,7 +28,8 @@ class SleepOperatorV1_0(FreeFlowExt):
 
     async def run(self, state, data):
         self._logger.debug("%s sleeping for %d", self._name, self._sleep)
-        await asyncio.sleep(self._sleep)
+        async with self._resource:
+            await asyncio.sleep(self._sleep)
 
         return state, data
 
@@ -48,6 +49,7 @@ class RandomSleepOperatorV1_0(FreeFlowExt):
     async def run(self, state, data):
         t = random.randint(self._sleep_min, self._sleep_max)
         self._logger.debug("%s sleeping for %d", self._name, t)
-        await asyncio.sleep(t)
+        async with self._resource:
+            await asyncio.sleep(t)
 
         return state, data
@@ -2,7 +2,9 @@ from .types import FreeFlowExt
 import aiosqlite
 import asyncio
 import logging
-from ..utils import EnvVarParser
+import time
+from ..trace import span
+from ..utils import EnvVarParser, Deadline
 
 __TYPENAME__ = "SqLiteExecutor"
 
@@ -42,10 +44,10 @@ class ConnectionPool():
         try:
             while not cls.POOL[client_name].empty():
                 await lock.acquire()
-                cls.LOGGER.debug("UNREGISTER {} Lock[{}/{}/{}] Queue[{}]".format(
+                cls.LOGGER.debug("UNREGISTER %s Lock[%d/%d/%d] Queue[%d]",
                     client_name, len(lock._waiters) if lock._waiters else 0,
                     lock._value, lock._bound_value,
-                    cls.POOL[client_name].qsize()))
+                    cls.POOL[client_name].qsize())
                 conn = await cls.POOL[client_name].get()
                 await conn.close()
         except aiosqlite.Error as ex:
@@ -62,37 +64,42 @@ class ConnectionPool():
             return None
 
         lock = cls.CLIENT[client_name]["lock"]
-        cls.LOGGER.debug("GET {} Lock[{}/{}/{}] Queue[{}]".format(
+        cls.LOGGER.debug("GET %s Lock[%d/%d/%d] Queue[%d]",
             client_name, len(lock._waiters) if lock._waiters else 0,
             lock._value, lock._bound_value,
-            cls.POOL[client_name].qsize()))
-        await lock.acquire()
+            cls.POOL[client_name].qsize())
+        with span("ConnectionPool.wait", "pool", client=client_name):
+            await lock.acquire()
 
+        db = None
         try:
             while not cls.POOL[client_name].empty():
                 conn = await cls.POOL[client_name].get()
                 if await cls.is_alive(conn):
                     return conn
-        except aiosqlite.Error as ex:
-            lock.release()
-            raise ex
 
-        conninfo = cls.CLIENT[client_name]["conninfo"]
+            conninfo = cls.CLIENT[client_name]["conninfo"]
 
-        db = await aiosqlite.connect(**conninfo)
-        db.text_factory = lambda x: x.decode(errors='ignore')
+            with span("ConnectionPool.connect", "pool", client=client_name):
+                db = await aiosqlite.connect(**conninfo)
+            db.text_factory = lambda x: x.decode(errors='ignore')
 
-        # default check foreign keys
-        await db.execute("PRAGMA foreign_keys = ON;")
+            # default check foreign keys
+            await db.execute("PRAGMA foreign_keys = ON;")
 
-        for pragma_name, pragma_value in cls.CLIENT[client_name]["pragma"].items():
-            await db.execute("PRAGMA {n} = {v};".format(
-                n=pragma_name, v=pragma_value))
+            for pragma_name, pragma_value in cls.CLIENT[client_name]["pragma"].items():
+                await db.execute("PRAGMA {n} = {v};".format(
+                    n=pragma_name, v=pragma_value))
 
-        await db.enable_load_extension(True)
-        for ext in cls.CLIENT[client_name]["extension"]:
-            await db.load_extension(ext)
-        return db
+            await db.enable_load_extension(True)
+            for ext in cls.CLIENT[client_name]["extension"]:
+                await db.load_extension(ext)
+            return db
+        except BaseException as ex:
+            if db is not None:
+                await db.close()
+            lock.release()
+            raise ex
 
     @classmethod
     async def release(cls, client_name, conn):
@@ -101,10 +108,10 @@ class ConnectionPool():
             await cls.POOL[client_name].put(conn)
             # await conn.close()
             lock.release()
-            cls.LOGGER.debug("RELEASE {} Lock[{}/{}/{}] Queue[{}]".format(
+            cls.LOGGER.debug("RELEASE %s Lock[%d/%d/%d] Queue[%d]",
                 client_name, len(lock._waiters) if lock._waiters else 0,
                 lock._value, lock._bound_value,
-                cls.POOL[client_name].qsize()))
+                cls.POOL[client_name].qsize())
         else:
             await conn.close()
 
@@ -129,8 +136,10 @@ class SqLiteExecutorV1_0(FreeFlowExt):
     __version__ = "1.0"
 
     def __init__(self, name, path, statement=None, param={}, pragma={},
-                 extension=[], max_connections=4, max_tasks=4):
+                 extension=[], max_connections=4, max_tasks=4,
+                 chunk_size=1000):
         super().__init__(name, max_tasks=max_tasks)
+        self._chunk_size = chunk_size
 
         self._conninfo = {"database": EnvVarParser.parse(path)}
         for k, v in param.items():
@@ -173,13 +182,21 @@ class SqLiteExecutorV1_0(FreeFlowExt):
             self._logger.error(ex)
             return state, (rs, 101)
 
+        deadline = Deadline.get()
+
         try:
+            if deadline is not None:
+                # abort the statement from the sqlite thread once the
+                # deadline has passed
+                await conn.set_progress_handler(
+                    lambda: time.monotonic() > deadline, 1000)
+
             async with conn.cursor() as cur:
                 value = data.get("value")
                 placeholder = data.get("placeholder", {})
 
                 stm = self._stm.format(**placeholder)
-                self._logger.debug(f"executing statement: {stm}")
+                self._logger.debug("executing statement: %s", stm)
 
                 if value is not None:
                     if value and isinstance(value, list) and len(value) > 0:
@@ -194,10 +211,73 @@ class SqLiteExecutorV1_0(FreeFlowExt):
 
                 await conn.commit()
         except aiosqlite.Error as ex:
-            rc = 102
+            rc = 104 if deadline is not None and time.monotonic() > deadline \
+                else 102
             await conn.rollback()
             self._logger.error(ex)
         finally:
+            if deadline is not None:
+                await conn.set_progress_handler(None, 0)
             await ConnectionPool.release(self._name, conn)
 
         return state, (rs, rc)
+
+    async def _fetch(self, conn, data):
+        # chunks of the resultset, fetched while the consumers keep up; one
+        # slot of the node resource class while fetching a chunk, released
+        # before the consumers get it
+        async with conn.cursor() as cur:
+            value = data.get("value")
+            placeholder = data.get("placeholder", {})
+
+            stm = self._stm.format(**placeholder)
+            self._logger.debug("streaming statement: %s", stm)
+
+            async with self._resource:
+                if isinstance(value, dict) and len(value) > 0:
+                    await cur.execute(stm, value)
+                else:
+                    await cur.execute(stm)
+
+            while cur.description:
+                async with self._resource:
+                    rows = await cur.fetchmany(self._chunk_size)
+                if len(rows) == 0:
+                    break
+                yield rows
+
+        async with self._resource:
+            await conn.commit()
+
+    async def stream(self, state, data):
+        async for item in data:
+            if item[1] != 0:
+                yield item
+                continue
+
+            try:
+                conn = await ConnectionPool.get(self._name)
+            except aiosqlite.Error as ex:
+                self._logger.error(ex)
+                yield {"resultset": []}, 101
+                continue
+
+            deadline = Deadline.get()
+            chunks = self._fetch(conn, item[0])
+            try:
+                if deadline is not None:
+                    await conn.set_progress_handler(
+                        lambda: time.monotonic() > deadline, 1000)
+
+                async for rows in chunks:
+                    yield {"resultset": rows}, 0
+            except aiosqlite.Error as ex:
+                await conn.rollback()
+                self._logger.error(ex)
+                yield {"resultset": []}, 104 if deadline is not None and \
+                    time.monotonic() > deadline else 102
+            finally:
+                await chunks.aclose()
+                if deadline is not None:
+                    await conn.set_progress_handler(None, 0)
+                await ConnectionPool.release(self._name, conn)
@@ -1,5 +1,9 @@
 from ..registry import ExtRegister
+from ..limiter import UNLIMITED
+from ..trace import span
 import asyncio
+import functools
+import time
 
 """
 run parameter:
@@ -16,6 +20,27 @@ class FreeFlowExt(metaclass=ExtRegister):
     def __init__(self, name, max_tasks=4):
         self._name = name
         self._max_tasks = max_tasks
+        self._executor = None
+        self._resource = UNLIMITED
+        self._metrics = None
+
+    def set_executor(self, executor):
+        self._executor = executor
+
+    def set_resource(self, resource):
+        self._resource = resource
+
+    def set_metrics(self, metrics):
+        self._metrics = metrics
+
+    async def offload(self, fn, *args, **kwargs):
+        # CPU bound or blocking work, moved to the pipeline thread pool when
+        # the node is configured with executor: thread; the arguments must
+        # not be changed by the loop meanwhile, pass a copy of the run state
+        if self._executor is None:
+            return fn(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs))
 
     async def fini(self):
         pass
@@ -23,48 +48,94 @@ class FreeFlowExt(metaclass=ExtRegister):
     async def do(self, state, data):
         raise NotImplementedError
 
-    async def unpack(self, state, data):
-        if isinstance(data, list):
-            loop = asyncio.get_running_loop()
-
-            # [param0, param1, ...]
-            cur = self._max_tasks
-            _data = []
-            aws = []
-
-            for i, p in enumerate(data):
-                if cur == 0:
-                    done, pending = await asyncio.wait(
-                        aws, return_when=asyncio.FIRST_COMPLETED)
-                    aws = list(pending)
-                    cur += len(done)
-                    for task in done:
-                        _, t = await task
-                        _data.append(t)
+    async def _do(self, state, data):
+        # one slot of the node resource class for every call, see limiter.py
+        async with self._resource:
+            if self._metrics is None:
+                return await self.do(state, data)
+
+            start = time.monotonic()
+            try:
+                return await self.do(state, data)
+            finally:
+                self._metrics.call(time.monotonic() - start)
+
+    async def _fanout(self, state, data, emit):
+        loop = asyncio.get_running_loop()
+        items = enumerate(data)
 
+        # the workers share the iterator, so each input is taken once and
+        # at most max_tasks do() calls are in flight
+        async def worker():
+            nonlocal state
+            for i, p in items:
                 if p[1] == 0:
-                    aws.append(loop.create_task(
-                        self.do(state, p[0]),
-                        name=self._name + "-unpack-" + str(i)))
-                    cur -= 1
+                    with span(self._name, "item", index=i):
+                        state, t = await self._do(state, p[0])
+                    emit(i, t)
                 else:
-                    _data.append(p)
+                    emit(i, p)
 
-            if len(aws) > 0:
-                done, pending = await asyncio.wait(
-                    aws, return_when=asyncio.ALL_COMPLETED)
+        n = min(self._max_tasks, len(data)) if isinstance(data, list) \
+            else self._max_tasks
+        workers = [loop.create_task(worker(),
+                                    name=self._name + "-unpack-" + str(w))
+                   for w in range(n)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for w in workers:
+                w.cancel()
+            raise
 
-                assert (len(pending) == 0)
-                for task in done:
-                    state, t = await task
-                    _data.append(t)
+        return state
 
+    async def unpack_as_completed(self, state, data):
+        # [param0, param1, ...] -> (index, result) in completion order
+        queue = asyncio.Queue()
+        fanout = asyncio.get_running_loop().create_task(
+            self._fanout(state, data,
+                         lambda i, t: queue.put_nowait((i, t))),
+            name=self._name + "-unpack")
+        fanout.add_done_callback(lambda _: queue.put_nowait(None))
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+            await fanout
+        finally:
+            if not fanout.done():
+                fanout.cancel()
+
+    async def unpack(self, state, data):
+        if isinstance(data, list):
+            # [param0, param1, ...] -> [result0, result1, ...]
+            _data = [None] * len(data)
+
+            def emit(i, t):
+                _data[i] = t
+
+            state = await self._fanout(state, data, emit)
             return state, _data
         else:
             # param0 or param1 or ...
             if data[1] == 0:
-                return await self.do(state, data[0])
+                return await self._do(state, data[0])
             return state, data
 
     async def run(self, state, data={}):
         return await self.unpack(state, data)
+
+    async def stream(self, state, data):
+        # (data, rc) items -> (data, rc) items, see stream.py; extensions
+        # that can produce or consume incrementally override it
+        async for item in data:
+            state, out = await self.run(state, item)
+            if isinstance(out, list):
+                for x in out:
+                    yield x
+            else:
+                yield out
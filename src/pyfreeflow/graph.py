@@ -0,0 +1,201 @@
+"""
+Digraph parser and compiled execution plan of a pipeline graph.
+
+The digraph is the list of edge statements of the pipeline configuration,
+written in a subset of the dot syntax:
+
+digraph:
+  - A -> B
+  - B -> C -> D; A -> D
+  - "node with spaces" -> D [label="ignored"]
+  - E
+  # full line comments are skipped
+
+Nodes are identified by their position in the topological order, so the
+plan can be walked with plain index lookups:
+
+names     ("A", "B", "C", "D")
+index     {"A": 0, "B": 1, "C": 2, "D": 3}
+pred      ((), (0,), (1,), (0,))
+succ      ((1, 3), (2,), (), ())
+indegree  (0, 1, 1, 1)
+outdegree (2, 1, 0, 0)
+"""
+import re
+
+
+class DigraphParser():
+    TOKEN_RE = re.compile(
+        r'\s*(?:("(?:[^"\\]|\\.)*")|(->)|(;)|(\[[^\]]*\])|((?:(?!->)[^\s;\[\]"])+))')
+    COMMENT_RE = re.compile(r'^\s*(#|//)')
+
+    @classmethod
+    def _tokenize(cls, line):
+        pos = 0
+        end = len(line.rstrip())
+        while pos < end:
+            m = cls.TOKEN_RE.match(line, pos)
+            if m is None or m.end() == pos:
+                raise ValueError("invalid digraph statement '{}'".format(line))
+            pos = m.end()
+
+            if m.group(1) is not None:
+                yield "id", m.group(1)[1:-1].replace('\\"', '"')
+            elif m.group(2) is not None:
+                yield "edge", None
+            elif m.group(3) is not None:
+                yield "end", None
+            elif m.group(5) is not None:
+                yield "id", m.group(5)
+
+    @classmethod
+    def _statement(cls, line, chain, node, edges):
+        if len(chain) == 0:
+            return
+
+        if len(chain) % 2 == 0 or chain[-1] is None:
+            raise ValueError("invalid digraph statement '{}'".format(line))
+
+        names = chain[::2]
+        if None in names or any(x is not None for x in chain[1::2]):
+            raise ValueError("invalid digraph statement '{}'".format(line))
+
+        for n in names:
+            node.setdefault(n, None)
+
+        for a, b in zip(names, names[1:]):
+            edges.setdefault((a, b), None)
+
+    @classmethod
+    def parse(cls, digraph):
+        node = {}
+        edges = {}
+
+        for line in digraph:
+            if cls.COMMENT_RE.match(line):
+                continue
+
+            chain = []
+            for kind, value in cls._tokenize(line):
+                if kind == "id":
+                    chain.append(value)
+                elif kind == "edge":
+                    chain.append(None)
+                elif kind == "end":
+                    cls._statement(line, chain, node, edges)
+                    chain = []
+            cls._statement(line, chain, node, edges)
+
+        return list(node.keys()), list(edges.keys())
+
+    @classmethod
+    def _find_cycle(cls, pred, remaining, start):
+        n = start
+        path = []
+        seen = {}
+        while n not in seen:
+            seen[n] = len(path)
+            path.append(n)
+            n = next(x for x in pred[n] if x in remaining)
+        return path[seen[n]:] + [n]
+
+    @classmethod
+    def topological_sort(cls, node, edges):
+        succ = {n: [] for n in node}
+        pred = {n: [] for n in node}
+        for a, b in edges:
+            succ[a].append(b)
+            pred[b].append(a)
+
+        indegree = {n: len(pred[n]) for n in node}
+        generation = [n for n in node if indegree[n] == 0]
+        order = []
+
+        while generation:
+            order.extend(generation)
+            following = []
+            for n in generation:
+                for s in succ[n]:
+                    indegree[s] -= 1
+                    if indegree[s] == 0:
+                        following.append(s)
+            generation = following
+
+        if len(order) < len(node):
+            # walked from the first node left, in declaration order, so the
+            # reported cycle does not depend on the set order
+            remaining = {n for n in node if indegree[n] > 0}
+            start = next(n for n in node if n in remaining)
+            raise ValueError("digraph contains a cycle: {}".format(
+                " -> ".join(reversed(
+                    cls._find_cycle(pred, remaining, start)))))
+
+        return order
+
+
+class ExecutionPlan():
+    __slots__ = ("names", "index", "pred", "succ", "indegree", "outdegree")
+
+    def __init__(self, order, edges):
+        index = {n: i for i, n in enumerate(order)}
+        pred = [[] for _ in order]
+        succ = [[] for _ in order]
+
+        seen = set()
+        for a, b in edges:
+            i, j = index[a], index[b]
+            if (i, j) not in seen:
+                seen.add((i, j))
+                pred[j].append(i)
+                succ[i].append(j)
+
+        for i, p in enumerate(pred):
+            if any(x >= i for x in p):
+                raise ValueError("node order is not topological")
+
+        object.__setattr__(self, "names", tuple(order))
+        object.__setattr__(self, "index", index)
+        object.__setattr__(self, "pred", tuple(tuple(x) for x in pred))
+        object.__setattr__(self, "succ", tuple(tuple(x) for x in succ))
+        object.__setattr__(self, "indegree", tuple(len(x) for x in pred))
+        object.__setattr__(self, "outdegree", tuple(len(x) for x in succ))
+
+    @classmethod
+    def compile(cls, digraph):
+        node, edges = DigraphParser.parse(digraph)
+        return cls(DigraphParser.topological_sort(node, edges), edges)
+
+    def ancestors(self, nodes):
+        seen = set(nodes)
+        stack = list(seen)
+        while stack:
+            for p in self.pred[stack.pop()]:
+                if p not in seen:
+                    seen.add(p)
+                    stack.append(p)
+        return seen
+
+    def subplan(self, nodes):
+        keep = sorted(nodes)
+        edges = [(self.names[p], self.names[i])
+                 for i in keep for p in self.pred[i] if p in nodes]
+        return ExecutionPlan([self.names[i] for i in keep], edges)
+
+    def to_networkx(self):
+        import networkx as nx
+
+        G = nx.DiGraph()
+        G.add_nodes_from(self.names)
+        G.add_edges_from((self.names[i], self.names[j])
+                         for i, s in enumerate(self.succ) for j in s)
+        return G
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ExecutionPlan is immutable")
+
+    def __len__(self):
+        return len(self.names)
+
+    def __str__(self):
+        return "ExecutionPlan(nodes: {n}, edges: {e})".format(
+            n=len(self.names), e=sum(self.indegree))
@@ -0,0 +1,186 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+
+"""
+Concurrency budget shared by the nodes, by named resource classes.
+
+Process level classes are shared by every pipeline of the process:
+
+ResourceLimiter.register("http", 32)
+
+or, with pyfreeflow-cli.py, in the configuration file:
+
+resources:
+  http: 32
+
+Pipeline level classes are declared in the pipeline configuration and bound
+the nodes of that pipeline only:
+
+pipeline:
+  resources:
+    http: 16
+    db: 4
+  node:
+  - name: "A"
+    type: "RestApiRequester"
+    version: "1.0"
+    resource: "http"  # Optional, class the node acquires from
+    config: {}
+
+A node acquires one slot for every do() call (and for every run() of the
+extensions that override run), first from the pipeline class and then from
+the process class with the same name, so max_tasks stays a per-node bound
+under the shared budget.
+
+Waiters are served by priority, the PRIORITY of the context they acquire
+from; the pipeline sets it to the critical path estimate of the node.
+"""
+
+PRIORITY = contextvars.ContextVar("pyfreeflow_priority", default=0.0)
+
+
+class PrioritySemaphore():
+    def __init__(self, value):
+        self._value = value
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def locked(self):
+        return self._value == 0
+
+    async def acquire(self, priority=None):
+        # a free slot implies no waiter, see release()
+        if self._value > 0:
+            self._value -= 1
+            return True
+
+        if priority is None:
+            priority = PRIORITY.get()
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # granted while being cancelled, hand the slot over
+                self.release()
+            raise
+        return True
+
+    def release(self):
+        while len(self._waiters) > 0:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(True)
+                return
+        self._value += 1
+
+
+class Resource():
+    def __init__(self, name, limit):
+        self._name = name
+        self._limit = limit
+        self._sem = PrioritySemaphore(limit)
+
+    def __str__(self):
+        return "Resource(name: {n}, limit: {l})".format(
+            n=self._name, l=self._limit)
+
+    async def __aenter__(self):
+        await self._sem.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._sem.release()
+
+
+class ResourceGroup():
+    # pipeline class, then process class
+    def __init__(self, resources):
+        self._resources = resources
+
+    async def __aenter__(self):
+        acquired = []
+        try:
+            for r in self._resources:
+                await r.__aenter__()
+                acquired.append(r)
+        except BaseException:
+            for r in reversed(acquired):
+                await r.__aexit__(None, None, None)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        for r in reversed(self._resources):
+            await r.__aexit__(exc_type, exc, tb)
+
+
+class Unlimited():
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+UNLIMITED = Unlimited()
+
+
+class Deadlined():
+    # waits for the resource until the deadline (time.monotonic()), then
+    # raises asyncio.TimeoutError
+    def __init__(self, resource, deadline=None):
+        self._resource = resource
+        self._deadline = deadline
+
+    async def __aenter__(self):
+        if self._deadline is None or self._resource is UNLIMITED:
+            await self._resource.__aenter__()
+        else:
+            await asyncio.wait_for(
+                self._resource.__aenter__(),
+                max(0.0, self._deadline - time.monotonic()))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._resource.__aexit__(exc_type, exc, tb)
+
+
+class ResourceLimiter():
+    RESOURCES = {}
+
+    @classmethod
+    def register(cls, name, limit):
+        cls.RESOURCES[name] = Resource(name, limit)
+
+    @classmethod
+    def unregister(cls, name):
+        cls.RESOURCES.pop(name, None)
+
+    def __init__(self, resources={}):
+        self._resources = {k: Resource(k, v) for k, v in resources.items()}
+
+    def __str__(self):
+        return "ResourceLimiter(pipeline: {p}, process: {g})".format(
+            p=list(self._resources.keys()),
+            g=list(self.RESOURCES.keys()))
+
+    def defined(self, name):
+        return name in self._resources.keys() or \
+            name in self.RESOURCES.keys()
+
+    def get(self, name):
+        if name is None:
+            return UNLIMITED
+
+        resources = [x for x in (self._resources.get(name),
+                                 self.RESOURCES.get(name)) if x is not None]
+        if len(resources) == 0:
+            raise ValueError("resource class '{}' not defined".format(name))
+        return resources[0] if len(resources) == 1 \
+            else ResourceGroup(resources)
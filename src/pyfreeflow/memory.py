@@ -0,0 +1,90 @@
+from .utils import deepsizeof
+import logging
+import tracemalloc
+
+"""
+Per-node memory profiler
+
+pipeline:
+  memory:  # Optional, or true for no thresholds
+    peak_bytes: 104857600  # Optional, warn when a node peak is over it
+    output_bytes: 10485760  # Optional, warn when a node output is over it
+  node: []
+  digraph: []
+
+Every node run records the tracemalloc peak over the memory traced when the
+node started, and the deep size of its output tuple (utils.deepsizeof). Both
+are reported by the node metrics (see metrics.py), with the number of runs
+over the thresholds.
+
+The peak is sampled when a node starts or ends, so the nodes running at the
+same time share it: the peak of each one is an upper bound. Memory allocated
+by the executor: process workers, and outside of the Python allocator (Lua
+runtime, C libraries), is not traced. tracemalloc slows down every
+allocation of the process, enable it to find a memory spike, not in
+production.
+"""
+
+
+class MemoryProfiler():
+    def __init__(self, name, peak_bytes=None, output_bytes=None, frames=1):
+        self._peak_bytes = peak_bytes
+        self._output_bytes = output_bytes
+        self._frames = frames
+        self._started = False
+        self._active = {}
+
+        self._logger = logging.getLogger(".".join([__name__, "MemoryProfiler",
+                                                   name]))
+
+    def __str__(self):
+        return "MemoryProfiler(peak_bytes: {p}, output_bytes: {o})".format(
+            p=self._peak_bytes, o=self._output_bytes)
+
+    @classmethod
+    def create(cls, name, config):
+        if config is True:
+            config = {}
+        return cls(name, **config)
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self._frames)
+            self._started = True
+
+    def stop(self):
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def _sample(self):
+        # the peak since the last sample belongs to every running node
+        current, peak = tracemalloc.get_traced_memory()
+        for x in self._active.values():
+            x[1] = max(x[1], peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def enter(self, key):
+        current = self._sample()
+        self._active[key] = [current, current]
+
+    def exit(self, key):
+        self._sample()
+        base, peak = self._active.pop(key)
+        return max(0, peak - base)
+
+    def size(self, out):
+        return deepsizeof(out)
+
+    def check(self, name, peak, size):
+        alert = False
+        if self._peak_bytes is not None and peak > self._peak_bytes:
+            self._logger.warning("node '%s' peak %d bytes over %d", name,
+                                 peak, self._peak_bytes)
+            alert = True
+        if self._output_bytes is not None and size > self._output_bytes:
+            self._logger.warning("node '%s' output %d bytes over %d", name,
+                                 size, self._output_bytes)
+            alert = True
+        return alert
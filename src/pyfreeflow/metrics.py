@@ -0,0 +1,242 @@
+import bisect
+import math
+
+"""
+Per-node metrics of a pipeline
+
+pipeline:
+  metrics: true  # Optional, default true
+  node: []
+  digraph: []
+
+Every node records, over all the runs since Pipeline.init() or the last
+Pipeline.reset_metrics():
+
+- seconds: histogram of the node run latency
+- wait_seconds: histogram of the time between the node getting ready and its
+  start, scheduler and max_concurrency wait included
+- call_seconds: histogram of the do() calls of FreeFlowExt.unpack, one per
+  item of a fan-out
+- items: (data, rc) items produced, one per run or one per item of a list
+- output_bytes: length of the str and bytes outputs, and of the str and bytes
+  values of dict and list outputs, one level deep
+- rc: items by return code, skipped nodes included
+- memory: with the memory profiler on (see memory.py), the largest and the
+  last tracemalloc peak and output size, and the runs over the thresholds
+
+Pipeline.metrics() returns a JSON serializable snapshot, and
+Pipeline.metrics_text() the Prometheus text exposition format.
+"""
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+           2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram():
+    def __init__(self, buckets=BUCKETS):
+        self._buckets = buckets
+        self.reset()
+
+    def reset(self):
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self._sum += value
+        self._count += 1
+
+    def cumulative(self):
+        total = 0
+        for le, n in zip(self._buckets + (math.inf,), self._counts):
+            total += n
+            yield le, total
+
+    def snapshot(self):
+        return {
+            "count": self._count,
+            "sum": self._sum,
+            "buckets": [["+Inf" if le == math.inf else le, n]
+                        for le, n in self.cumulative()],
+        }
+
+
+class NodeMetrics():
+    def __init__(self, name):
+        self._name = name
+        self.seconds = Histogram()
+        self.wait_seconds = Histogram()
+        self.call_seconds = Histogram()
+        self.reset()
+
+    def reset(self):
+        # in place, the extensions keep a reference (set_metrics)
+        self.seconds.reset()
+        self.wait_seconds.reset()
+        self.call_seconds.reset()
+        self.items = 0
+        self.output_bytes = 0
+        self.rc = {}
+        self.memory = None
+
+    def __str__(self):
+        return "NodeMetrics(name: {n}, items: {i})".format(
+            n=self._name, i=self.items)
+
+    @staticmethod
+    def nbytes(data):
+        if isinstance(data, (str, bytes, bytearray)):
+            return len(data)
+        if isinstance(data, dict):
+            data = data.values()
+        elif not isinstance(data, list):
+            return 0
+        return sum(len(x) for x in data
+                   if isinstance(x, (str, bytes, bytearray)))
+
+    def call(self, elapsed):
+        self.call_seconds.observe(elapsed)
+
+    def item(self, out):
+        rc = out[1] if out is not None else None
+        self.items += 1
+        self.rc[rc] = self.rc.get(rc, 0) + 1
+        if out is not None:
+            self.output_bytes += self.nbytes(out[0])
+
+    def output(self, out):
+        if isinstance(out, list):
+            for x in out:
+                self.item(x)
+        else:
+            self.item(out)
+
+    def profile(self, peak, size, alert):
+        if self.memory is None:
+            self.memory = {"peak_bytes": 0, "output_size": 0,
+                           "last_peak_bytes": 0, "last_output_size": 0,
+                           "alerts": 0}
+        m = self.memory
+        m["peak_bytes"] = max(m["peak_bytes"], peak)
+        m["output_size"] = max(m["output_size"], size)
+        m["last_peak_bytes"] = peak
+        m["last_output_size"] = size
+        m["alerts"] += 1 if alert else 0
+
+    def snapshot(self):
+        snapshot = {
+            "seconds": self.seconds.snapshot(),
+            "wait_seconds": self.wait_seconds.snapshot(),
+            "call_seconds": self.call_seconds.snapshot(),
+            "items": self.items,
+            "output_bytes": self.output_bytes,
+            "rc": {str(k): v for k, v in self.rc.items()},
+        }
+        if self.memory is not None:
+            snapshot["memory"] = dict(self.memory)
+        return snapshot
+
+
+class PipelineMetrics():
+    HISTOGRAMS = (
+        ("seconds", "Node run latency in seconds."),
+        ("wait_seconds", "Time from node ready to node start in seconds."),
+        ("call_seconds", "Latency of the node do() calls in seconds."),
+    )
+
+    COUNTERS = (
+        ("items", "Items produced by the node."),
+        ("output_bytes", "Bytes of the str and bytes node outputs."),
+    )
+
+    MEMORY = (
+        ("peak_bytes", "gauge", "Largest tracemalloc peak of a node run."),
+        ("output_size", "gauge", "Largest deep size of the node output."),
+        ("alerts", "counter", "Node runs over the memory thresholds."),
+    )
+
+    def __init__(self, name, names):
+        self._name = name
+        self._nodes = [NodeMetrics(n) for n in names]
+        self._names = tuple(names)
+
+    def __str__(self):
+        return "PipelineMetrics(name: {n}, nodes: {c})".format(
+            n=self._name, c=len(self._nodes))
+
+    def node(self, i):
+        return self._nodes[i]
+
+    def reset(self):
+        for node in self._nodes:
+            node.reset()
+
+    def snapshot(self):
+        return {
+            "pipeline": self._name,
+            "nodes": {n: m.snapshot()
+                      for n, m in zip(self._names, self._nodes)},
+        }
+
+    @staticmethod
+    def _escape(value):
+        return str(value).replace("\\", "\\\\").replace(
+            "\"", "\\\"").replace("\n", "\\n")
+
+    @staticmethod
+    def _number(value):
+        if value == math.inf:
+            return "+Inf"
+        return repr(float(value)) if isinstance(value, float) else str(value)
+
+    def text(self, prefix="pyfreeflow_node"):
+        lines = []
+        labels = ["pipeline=\"{p}\",node=\"{n}\"".format(
+            p=self._escape(self._name), n=self._escape(n))
+            for n in self._names]
+
+        for attr, doc in self.HISTOGRAMS:
+            metric = "_".join([prefix, attr])
+            lines.append("# HELP {m} {d}".format(m=metric, d=doc))
+            lines.append("# TYPE {m} histogram".format(m=metric))
+            for label, node in zip(labels, self._nodes):
+                h = getattr(node, attr)
+                for le, n in h.cumulative():
+                    lines.append("{m}_bucket{{{l},le=\"{b}\"}} {v}".format(
+                        m=metric, l=label, b=self._number(le), v=n))
+                lines.append("{m}_sum{{{l}}} {v}".format(
+                    m=metric, l=label, v=self._number(h._sum)))
+                lines.append("{m}_count{{{l}}} {v}".format(
+                    m=metric, l=label, v=h._count))
+
+        for attr, doc in self.COUNTERS:
+            metric = "_".join([prefix, attr, "total"])
+            lines.append("# HELP {m} {d}".format(m=metric, d=doc))
+            lines.append("# TYPE {m} counter".format(m=metric))
+            for label, node in zip(labels, self._nodes):
+                lines.append("{m}{{{l}}} {v}".format(
+                    m=metric, l=label, v=getattr(node, attr)))
+
+        metric = "_".join([prefix, "rc_total"])
+        lines.append("# HELP {m} Items produced by the node by return "
+                     "code.".format(m=metric))
+        lines.append("# TYPE {m} counter".format(m=metric))
+        for label, node in zip(labels, self._nodes):
+            for rc, n in sorted(node.rc.items(), key=lambda x: str(x[0])):
+                lines.append("{m}{{{l},rc=\"{r}\"}} {v}".format(
+                    m=metric, l=label, r=self._escape(rc), v=n))
+
+        profiled = [(label, node) for label, node in zip(labels, self._nodes)
+                    if node.memory is not None]
+        for attr, kind, doc in self.MEMORY if len(profiled) > 0 else ():
+            metric = "_".join([prefix, "memory", attr])
+            if kind == "counter":
+                metric += "_total"
+            lines.append("# HELP {m} {d}".format(m=metric, d=doc))
+            lines.append("# TYPE {m} {k}".format(m=metric, k=kind))
+            for label, node in profiled:
+                lines.append("{m}{{{l}}} {v}".format(
+                    m=metric, l=label, v=node.memory[attr]))
+
+        return "\n".join(lines) + "\n"
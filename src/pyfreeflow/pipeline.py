@@ -1,26 +1,71 @@
 from .registry import ExtRegistry
-import networkx as nx
-import io
+from .graph import ExecutionPlan
+from .cache import ResultCache
+from .utils import Deadline
+from .worker import ProcessExt, process_pool
+from .stream import Stream, StreamReader, StreamAborted, iterate
+from .limiter import ResourceLimiter, Resource, Deadlined, UNLIMITED, \
+    PRIORITY
+from .metrics import PipelineMetrics
+from .trace import TRACER
+from .critical_path import CriticalPath
+from .memory import MemoryProfiler
 import copy
+import time
+import itertools
+import functools
 import asyncio
 import logging
+import concurrent.futures
+import threading
+import os
+
+ON_ERROR = ("continue", "skip")
+EXECUTOR = ("loop", "thread", "process")
+FUSABLE = ("name", "type", "version", "config")
+
+SKIPPED = 103
+TIMEOUT = 104
+CANCELLED = 107
 
 """
 Example of configuratio file
 
 last: "D"  # Optional
+prune: false  # Optional, run only the ancestors of last and side effect nodes
+early_return: false  # Optional, return as soon as last completes
+on_error: "continue"  # Optional, "continue" or "skip" failed node descendants
+threads: 4  # Optional, size of the pool shared by the executor: thread nodes
+processes: 4  # Optional, worker processes of the executor: process nodes
+stream_buffer: 64  # Optional, items queued between streaming nodes
+resources:  # Optional, concurrency budget by class, see limiter.py
+  http: 16
+max_concurrency: 8  # Optional, nodes running at once, critical path first
+priority: true  # Optional, order ready nodes by critical path estimate
+fuse: true  # Optional, merge linear chains of DataTransformer in one Lua call
+metrics: true  # Optional, per-node latency, items and rc, see metrics.py
+memory: false  # Optional, per-node tracemalloc peak, see memory.py
 node:
 - name: "A"
   type: "RestApiRequester"
   version: "1.0"
+  on_error: "skip"  # Optional, override the pipeline on_error policy
+  timeout: 10  # Optional, node timeout in seconds
+  cache:  # Optional, memoize successful results, see cache.py
+    ttl: 60
+  critical: true  # Optional, cancel the whole run when the node fails
   config: {}
 - name: "B"
   type: "DataTransformer"
   version: "1.0"
+  executor: "thread"  # Optional, "loop", "thread" or "process" (see worker.py)
+  stream: false  # Optional, yield items to the successors, see stream.py
+  resource: "http"  # Optional, resource class limiting the node calls
   config: {}
 - name: "C"
   type: "RestApiRequester"
   version: "1.0"
+  side_effect: true  # Optional, always run even when pruned
   config: {}
 - name: "D"
   type: "DataTransformer"
@@ -33,119 +78,754 @@ digraph:
 """
 
 
+class PipelineContext():
+    def __init__(self, plan, deadline=None, priority=None):
+        self.data = [None] * len(plan)
+        self.state = {}
+        self.degrees = list(plan.indegree)
+        self.refs = list(plan.outdegree)
+        self.pending = len(plan)
+        self.poison = [False] * len(plan)
+        self.aborted = False
+        self.deadline = deadline
+        self.result = None
+        self.priority = priority if priority is not None \
+            else [0.0] * len(plan)
+        self.ready = asyncio.PriorityQueue()
+        self.ready_at = [0.0] * len(plan)
+        self.origin = time.monotonic()
+        self.timing = [None] * len(plan)
+        self.task = {}
+        self.stream = {}
+
+        for i, d in enumerate(self.degrees):
+            if d == 0:
+                self.push(i)
+
+        if self.pending == 0:
+            self.push(None)
+
+    def push(self, i):
+        # highest priority first, None once every node completed
+        if i is None:
+            self.ready.put_nowait((float("inf"), None))
+        else:
+            self.ready_at[i] = time.monotonic()
+            self.ready.put_nowait((-self.priority[i], i))
+
+    async def pop(self):
+        _, i = await self.ready.get()
+        return i
+
+    def clear(self):
+        t = self.state
+        self.state = {}
+        del t
+
+        t = self.data
+        self.data = []
+        del t
+
+        self.stream = {}
+
+
 class Pipeline():
     def __init__(self):
         self._registry = {}
-        self._data = {}
-        self._state = {}
-        self._lock = asyncio.Lock()
-        self._cond = asyncio.Condition()
-        self._G = None
-        self._tree = None
-
-    async def init(self, node, digraph, last=None, name="stream"):
+        self._background = set()
+        self._plan = None
+        self._node = None
+        self._cache = None
+        self._metrics = None
+        self._memory = None
+        self._timing = None
+        self._executor = None
+        self._processes = None
+        self._result = None
+
+    async def init(self, node, digraph, last=None, name="stream",
+                   prune=False, on_error="continue", early_return=False,
+                   cache_path=None, threads=None, processes=None,
+                   stream_buffer=64, resources={}, max_concurrency=None,
+                   priority=True, fuse=True, metrics=True, memory=False):
         self._name = name
         self._last = last
+        self._early_return = early_return
+        self._stream_buffer = stream_buffer
+        self._limiter = ResourceLimiter(resources)
+        self._slots = Resource("pipeline", max_concurrency) \
+            if max_concurrency is not None else UNLIMITED
+        self._priority = priority
 
         self._logger = logging.getLogger(".".join([__name__, "Pipeline",
                                                    self._name]))
 
+        if memory and not metrics:
+            raise ValueError("memory profiler requires metrics")
+
+        side_effect = []
+        policy = {}
+        conf = {}
         for cls in node:
             cls_name = cls.get("name")
+            conf[cls_name] = cls
             cls_config = cls.get("config", {})
             cls_type = cls.get("type")
             cls_version = cls.get("version")
+            cls_side_effect = cls.get("side_effect", False)
+            cls_on_error = cls.get("on_error", on_error)
+            cls_critical = cls.get("critical", False)
+            cls_timeout = cls.get("timeout")
+            cls_cache = cls.get("cache")
+            cls_executor = cls.get("executor", "loop")
+            cls_stream = cls.get("stream", False)
+            cls_resource = cls.get("resource")
 
             if cls_name in self._registry.keys():
                 await self.fini()
                 raise ValueError("node '{c}' already in the registry".format(
                     c=cls_name))
 
-            self._registry[cls_name] = ExtRegistry.get_registered_class(
-                cls_type, cls_version)(cls_name, **cls_config)
+            if cls_on_error not in ON_ERROR:
+                await self.fini()
+                raise ValueError("node '{c}' bad on_error '{e}'".format(
+                    c=cls_name, e=cls_on_error))
+
+            if cls_executor not in EXECUTOR:
+                await self.fini()
+                raise ValueError("node '{c}' bad executor '{e}'".format(
+                    c=cls_name, e=cls_executor))
+
+            if cls_resource is not None and \
+                    not self._limiter.defined(cls_resource):
+                await self.fini()
+                raise ValueError("node '{c}' bad resource '{r}'".format(
+                    c=cls_name, r=cls_resource))
+
+            if cls_stream and cls_cache is not None:
+                await self.fini()
+                raise ValueError("node '{c}' streams, it cannot be cached".format(
+                    c=cls_name))
+
+            if cls_type == "DataTransformer" and cls_cache is not None:
+                # a hit would not replay the state changes of the node
+                await self.fini()
+                raise ValueError("node '{c}' updates the state, it cannot be cached".format(
+                    c=cls_name))
+
+            ext = ExtRegistry.get_registered_class(cls_type, cls_version)
+            if cls_executor == "process":
+                if self._processes is None:
+                    self._processes = process_pool(processes)
+                self._registry[cls_name] = ProcessExt(
+                    cls_name, self._processes, ext, cls_config)
+            else:
+                self._registry[cls_name] = ext(cls_name, **cls_config)
+
+            self._registry[cls_name].set_resource(
+                self._limiter.get(cls_resource))
 
-        dot = io.StringIO("digraph D {" + "\n".join(digraph) + "}")
-        self._G = nx.nx_pydot.read_dot(dot)
+            if cls_executor == "thread":
+                if self._executor is None:
+                    self._executor = self._thread_pool(threads)
+                self._registry[cls_name].set_executor(self._executor)
 
-        self._tree = list(nx.topological_sort(self._G))
+            if cls_side_effect:
+                side_effect.append(cls_name)
+            policy[cls_name] = (cls_on_error == "skip", cls_critical,
+                                cls_timeout,
+                                ResultCache.create(cls, path=cache_path)
+                                if cls_cache is not None else None,
+                                cls_stream)
+
+        try:
+            self._plan = ExecutionPlan.compile(digraph)
+        except ValueError:
+            await self.fini()
+            raise
+
+        for n in self._plan.names:
+            if n not in self._registry.keys():
+                await self.fini()
+                raise ValueError("node '{c}' not in the registry".format(c=n))
+
+        if self._last is not None and self._last not in self._plan.index:
+            await self.fini()
+            raise ValueError("node '{c}' not in the digraph".format(
+                c=self._last))
+
+        if prune and len(self._plan) > 0:
+            result = self._last if self._last is not None \
+                else self._plan.names[-1]
+            roots = [self._plan.index[x] for x in [result] + side_effect
+                     if x in self._plan.index]
+            self._plan = self._plan.subplan(self._plan.ancestors(roots))
+            self._logger.debug("pruned pipeline to %d nodes", len(self._plan))
+            self._last = result
+
+        if fuse and len(self._plan) > 0:
+            await self._fuse(conf)
+
+        self._node = tuple(self._registry[n] for n in self._plan.names)
+        self._skip = tuple(policy[n][0] for n in self._plan.names)
+        self._critical = tuple(policy[n][1] for n in self._plan.names)
+        self._timeout = tuple(policy[n][2] for n in self._plan.names)
+        self._cache = tuple(policy[n][3] for n in self._plan.names)
+        self._stream = tuple(policy[n][4] for n in self._plan.names)
+        # streaming successors fed item by item through a queue, started
+        # when the stream opens; the others wait for the whole output
+        self._piped = tuple(
+            tuple(j for j in self._plan.succ[i]
+                  if self._stream[i] and self._stream[j] and
+                  self._plan.indegree[j] == 1)
+            for i in range(len(self._plan)))
+        self._after = tuple(
+            tuple(j for j in self._plan.succ[i] if j not in self._piped[i])
+            for i in range(len(self._plan)))
+        self._result = self._plan.index[self._last] if self._last is not None \
+            else len(self._plan) - 1
+        self._latency = [None] * len(self._plan)
+
+        if metrics:
+            self._metrics = PipelineMetrics(self._name, self._plan.names)
+            for i, ext in enumerate(self._node):
+                ext.set_metrics(self._metrics.node(i))
+
+        if memory:
+            self._memory = MemoryProfiler.create(self._name, memory)
+            self._memory.start()
+
+    def _thread_pool(self, threads):
+        # start every worker now: a thread started while the others hold
+        # the GIL would block the event loop until it gets scheduled
+        threads = threads or min(32, (os.cpu_count() or 1) + 4)
+        pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix=self._name + "-worker")
+        barrier = threading.Barrier(threads)
+        concurrent.futures.wait(
+            [pool.submit(barrier.wait) for _ in range(threads)])
+        return pool
+
+    def _fusable(self, cls, head):
+        config = cls.get("config", {})
+        return cls.get("type") == "DataTransformer" and \
+            cls.get("version") == "1.0" and \
+            all(k in FUSABLE for k in cls.keys()) and \
+            config.get("secret") is None and \
+            not config.get("userdefined", False) and \
+            (head or not config.get("force", False))
+
+    async def _fuse(self, conf):
+        # linear DataTransformer chains, the intermediate outputs are seen
+        # only by the next node of the chain
+        plan = self._plan
+        result = self._last if self._last is not None else plan.names[-1]
+        fused = {}
+        member = set()
+
+        for i, n in enumerate(plan.names):
+            if i in member or not self._fusable(conf[n], True):
+                continue
+
+            chain = [i]
+            while plan.outdegree[chain[-1]] == 1 and \
+                    plan.names[chain[-1]] != result:
+                j = plan.succ[chain[-1]][0]
+                if plan.indegree[j] != 1 or \
+                        not self._fusable(conf[plan.names[j]], False):
+                    break
+                chain.append(j)
+
+            if len(chain) > 1:
+                member.update(chain)
+                fused[chain[-1]] = chain
+
+        if len(fused) == 0:
+            return
+
+        tail = {x: t for t, chain in fused.items() for x in chain}
+        order = [n for i, n in enumerate(plan.names)
+                 if i not in member or i in fused]
+        edges = [(plan.names[tail.get(p, p)], plan.names[tail.get(i, i)])
+                 for i in range(len(plan)) for p in plan.pred[i]
+                 if tail.get(p, p) != tail.get(i, i)]
+
+        DataTransformer = ExtRegistry.get_registered_class(
+            "DataTransformer", "1.0")
+        for t, chain in fused.items():
+            names = [plan.names[x] for x in chain]
+            for n in names:
+                await self._registry.pop(n).fini()
+
+            self._registry[names[-1]] = DataTransformer.fuse(
+                names[-1],
+                [(n, conf[n].get("config", {}).get("transformer", ""))
+                 for n in names],
+                force=conf[names[0]].get("config", {}).get("force", False))
+            self._logger.debug("fused %s into '%s'", names, names[-1])
+
+        self._plan = ExecutionPlan(order, edges)
 
     def __del__(self):
         if len(self._registry) > 0:
             self._logger.warning("object deleted before calling its fini()")
 
+    def plan(self):
+        return self._plan
+
+    def cache_stats(self):
+        return {n: c.stats() for n, c in zip(self._plan.names, self._cache)
+                if c is not None}
+
+    def metrics(self):
+        return self._metrics.snapshot() if self._metrics is not None \
+            else None
+
+    def metrics_text(self):
+        return self._metrics.text() if self._metrics is not None else ""
+
+    def reset_metrics(self):
+        # the EWMA latencies behind the node priorities are kept
+        if self._metrics is not None:
+            self._metrics.reset()
+
+    def critical_path(self):
+        # from the timings of the last completed run, see critical_path.py
+        if self._timing is None:
+            return None
+        return CriticalPath(self._plan, *self._timing)
+
+    def critical_path_report(self, improvement=20):
+        cp = self.critical_path()
+        return cp.report(improvement) if cp is not None else None
+
     def configured(self):
-        return len(self._registry) > 0 and self._G is not None and self._tree is not None
+        return len(self._registry) > 0 and self._plan is not None
+
+    async def drain(self):
+        while len(self._background) > 0:
+            await asyncio.gather(*self._background, return_exceptions=True)
 
     async def fini(self):
+        await self.drain()
+
+        for cache in self._cache or []:
+            if cache is not None:
+                await cache.close()
+
         keys = [x for x in self._registry.keys()]
         for k in keys:
             cls = self._registry.pop(k)
             await cls.fini()
             del cls
 
-    async def _cleanup(self):
-        t = self._state
-        self._state = {}
-        del t
+        if self._memory is not None:
+            self._memory.stop()
+            self._memory = None
 
-        t = self._data
-        self._data = {}
-        del t
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+        if self._processes is not None:
+            # the workers close their nodes before exiting
+            await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self._processes.shutdown,
+                                        cancel_futures=True))
+            self._processes = None
+
+    def _complete(self, ctx, i):
+        ctx.task.pop(i, None)
+        ctx.pending -= 1
+
+        degrees = ctx.degrees
+        for j in (self._after[i] if i in ctx.stream else self._plan.succ[i]):
+            degrees[j] -= 1
+            if degrees[j] == 0:
+                ctx.push(j)
+
+        if ctx.pending == 0:
+            self._timing = (ctx.origin, time.monotonic(), ctx.timing)
+            ctx.push(None)
+
+    def _open(self, ctx, i):
+        degrees = ctx.degrees
+        for j in self._piped[i]:
+            degrees[j] -= 1
+            if degrees[j] == 0:
+                ctx.push(j)
+
+    def _release(self, ctx, prev):
+        for x in prev:
+            ctx.refs[x] -= 1
+            if ctx.refs[x] == 0 and x != self._result:
+                ctx.data[x] = None
+
+    @classmethod
+    def _failed(cls, out):
+        if isinstance(out, list):
+            return len(out) > 0 and all(cls._failed(x) for x in out)
+        return out is None or out[1] != 0
+
+    def _abort(self, ctx, i):
+        ctx.aborted = True
+        for j, t in ctx.task.items():
+            if j != i:
+                t.cancel()
+
+    def _store(self, ctx, i, out):
+        if (self._skip[i] or self._critical[i]) and self._failed(out):
+            ctx.poison[i] = True
+            if self._critical[i] and not ctx.aborted:
+                self._logger.error("critical node '%s' failed, aborting run",
+                                   self._plan.names[i])
+                self._abort(ctx, i)
+
+        self._keep(ctx, i, out)
+
+    def _keep(self, ctx, i, out):
+        if i == self._result:
+            ctx.data[i] = out
+            if ctx.result is not None and not ctx.result.done():
+                ctx.result.set_result(i)
+        elif ctx.refs[i] > 0:
+            ctx.data[i] = out
+
+    def _skip_node(self, ctx, i):
+        ctx.poison[i] = True
+        now = time.monotonic()
+        ctx.timing[i] = (now, now)
+        if self._metrics is not None:
+            self._metrics.node(i).item((None, SKIPPED))
+        self._keep(ctx, i, (None, SKIPPED))
+        self._complete(ctx, i)
+
+    def _cancelled(self, ctx, i, task):
+        # cancelled before its first step, _task never ran its finally block
+        if ctx.task.get(i) is task:
+            if self._metrics is not None:
+                self._metrics.node(i).item((None, CANCELLED))
+            self._store(ctx, i, (None, CANCELLED))
+            self._complete(ctx, i)
+
+    def _deadline(self, ctx, i):
+        deadline = ctx.deadline
+        if self._timeout[i] is not None:
+            t = time.monotonic() + self._timeout[i]
+            deadline = t if deadline is None else min(deadline, t)
+        return deadline
+
+    async def _stream_node(self, ctx, i, _data):
+        stream = Stream(self._piped[i],
+                        collect=i == self._result or len(self._after[i]) > 0,
+                        maxsize=self._stream_buffer)
+        ctx.stream[i] = stream
+        self._open(ctx, i)
+
+        # the extension updates the run state in place
+        items = self._node[i].stream(ctx.state, iterate(_data))
+        try:
+            async for item in items:
+                await stream.put(item)
+                if stream.unused():
+                    break
+        except BaseException as ex:
+            stream.abort(self._aborted(ex))
+            raise
+        finally:
+            await items.aclose()
+
+        await stream.close()
+        return stream.items()
+
+    @staticmethod
+    def _aborted(ex):
+        # return code the readers of an aborted stream fail with
+        if isinstance(ex, StreamAborted):
+            return ex.rc
+        if isinstance(ex, (asyncio.CancelledError, asyncio.TimeoutError)):
+            # wait_for cancels the node when its deadline expires
+            deadline = Deadline.get()
+            if deadline is not None and time.monotonic() >= deadline:
+                return TIMEOUT
+            return CANCELLED
+        return 101
+
+    async def _call(self, ctx, i, _data):
+        if self._stream[i]:
+            return await self._stream_node(ctx, i, _data)
+
+        ctx.state, _out = await self._node[i].run(ctx.state, _data)
+        return _out
+
+    async def _execute(self, ctx, i, _data, deadline):
+        if deadline is None:
+            return await self._call(ctx, i, _data)
 
-    async def _task(self, n, _data):
+        # visible to the extension, so it can shorten its own timeouts
+        Deadline.set(deadline)
+        return await asyncio.wait_for(self._call(ctx, i, _data),
+                                      max(0.0, deadline - time.monotonic()))
+
+    def _observe(self, i, elapsed, alpha=0.2):
+        latency = self._latency[i]
+        self._latency[i] = elapsed if latency is None \
+            else latency + alpha * (elapsed - latency)
+
+    def _priorities(self):
+        # expected time from the node start to the end of the longest
+        # downstream path, from the EWMA node latencies
+        plan = self._plan
+        known = [x for x in self._latency if x is not None]
+        default = sum(known) / len(known) if len(known) > 0 else 1.0
+
+        priority = [0.0] * len(plan)
+        for i in reversed(range(len(plan))):
+            down = max((priority[j] for j in plan.succ[i]), default=0.0)
+            latency = self._latency[i]
+            priority[i] = (latency if latency is not None else default) + down
+        return priority
+
+    async def _task(self, ctx, i, _data):
+        _out = None
+        start = None
+        # resource classes serve the waiters on the critical path first
+        PRIORITY.set(ctx.priority[i])
         try:
-            self._state, self._data[n] = await self._registry[n].run(
-                self._state, _data)
+            # a piped consumer must run along with its producer
+            slot = UNLIMITED if isinstance(_data, StreamReader) \
+                else self._slots
+            # the wait for max_concurrency counts against the deadline
+            deadline = self._deadline(ctx, i)
+            async with Deadlined(slot, deadline):
+                start = time.monotonic()
+                if self._metrics is not None:
+                    self._metrics.node(i).wait_seconds.observe(
+                        start - ctx.ready_at[i])
+                if self._memory is not None:
+                    self._memory.enter((id(ctx), i))
+                cache = self._cache[i]
+                if cache is None:
+                    _out = await self._execute(ctx, i, _data, deadline)
+                else:
+                    key = cache.node_key(ctx.state, _data)
+                    _out = await cache.get(key) if key is not None else None
+                    if _out is None:
+                        _out = await self._execute(ctx, i, _data, deadline)
+                        await cache.put(key, _out)
+                elapsed = time.monotonic() - start
+                self._observe(i, elapsed)
+                if self._metrics is not None:
+                    self._metrics.node(i).seconds.observe(elapsed)
 
+        except asyncio.TimeoutError:
+            self._logger.error("node '%s' timed out", self._plan.names[i])
+            _out = (None, TIMEOUT)
+        except asyncio.CancelledError:
+            _out = (None, CANCELLED)
+            raise
+        except StreamAborted as ex:
+            self._logger.error("node '%s' input %s", self._plan.names[i], ex)
+            _out = (None, ex.rc)
         except Exception as ex:
             self._logger.error(ex)
         finally:
-            async with self._cond:
-                self._cond.notify()
+            if isinstance(_data, StreamReader):
+                _data.close()
+            if self._metrics is not None:
+                self._metrics.node(i).output(_out)
+            if start is not None:
+                ctx.timing[i] = (start, time.monotonic())
+                if self._memory is not None:
+                    self._profile(ctx, i, _out)
+            tracer = TRACER.get()
+            if tracer is not None and start is not None:
+                self._trace(tracer, ctx, i, start, _out)
+            self._store(ctx, i, _out)
+            del _out
+            self._complete(ctx, i)
+
+    def _profile(self, ctx, i, out):
+        peak = self._memory.exit((id(ctx), i))
+        size = self._memory.size(out)
+        alert = self._memory.check(self._plan.names[i], peak, size)
+        self._metrics.node(i).profile(peak, size, alert)
+
+    def _trace(self, tracer, ctx, i, start, out):
+        name = self._plan.names[i]
+        tracer.complete(name, "wait", ctx.ready_at[i], start)
+        if isinstance(out, list):
+            tracer.complete(name, "node", start, time.monotonic(),
+                            items=len(out),
+                            failed=sum(1 for x in out if self._failed(x)))
+        else:
+            tracer.complete(name, "node", start, time.monotonic(),
+                            rc=out[1] if out is not None else None)
+
+    def _drained(self, task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._logger.error("background run failed: %s", task.exception())
 
-    async def run(self, data={}):
+    async def _schedule(self, ctx, data):
+        plan = self._plan
+        loop = asyncio.get_running_loop()
+
+        try:
+            while True:
+                i = await ctx.pop()
+                if i is None:
+                    break
+
+                _prev = plan.pred[i]
+                # a producer that ended before opening its stream (skipped,
+                # timed out, cancelled) released its consumers as ordinary
+                # successors, they get its stored output
+                piped = len(_prev) == 1 and i in self._piped[_prev[0]] and \
+                    _prev[0] in ctx.stream
+                if ctx.aborted or any(ctx.poison[x] for x in _prev):
+                    if piped:
+                        ctx.stream[_prev[0]].detach(i)
+                    self._release(ctx, _prev)
+                    self._skip_node(ctx, i)
+                    continue
+
+                if len(_prev) > 1:
+                    _data = [ctx.data[x] for x in _prev]
+                elif piped:
+                    _data = ctx.stream[_prev[0]].reader(i)
+                elif len(_prev) == 1:
+                    _data = ctx.data[_prev[0]]
+                else:
+                    _data = (data, 0)
+
+                self._release(ctx, _prev)
+                ctx.task[i] = loop.create_task(self._task(ctx, i, _data),
+                                               name=plan.names[i])
+                ctx.task[i].add_done_callback(
+                    functools.partial(self._cancelled, ctx, i))
+                del _data
+        except asyncio.CancelledError:
+            self._abort(ctx, None)
+            raise
+
+    async def run(self, data={}, timeout=None, tracer=None):
         if not self.configured():
             raise RuntimeError("pipeline executed without being configured")
 
-        async with self._lock:
-            degrees = {x[0]: x[1] for x in self._G.in_degree()}
-            loop = asyncio.get_running_loop()
+        if tracer is None:
+            tracer = TRACER.get()
+        if tracer is None:
+            return await self._run(data, timeout)
 
-            pending = len(self._tree)
-            task = {}
-
-            while pending > 0:
-                nodes = [k for k, v in degrees.items() if v == 0]
-                for n in nodes:
-                    _prev = list(self._G.predecessors(n))
-                    if len(_prev) > 1:
-                        _data = [self._data.get(x) for x in _prev]
-                    elif len(_prev) == 1:
-                        _data = self._data.get(_prev[0])
-                    else:
-                        _data = (data, 0)
+        # the node tasks inherit the tracer from this context
+        token = TRACER.set(tracer)
+        try:
+            with tracer.span(self._name, "pipeline"):
+                return await self._run(data, timeout)
+        finally:
+            TRACER.reset(token)
 
-                    task[n] = loop.create_task(self._task(n, _data),
-                                               name=n)
-                    degrees[n] -= 1
+    async def _run(self, data, timeout):
 
-                async with self._cond:
-                    await self._cond.wait()
+        ctx = PipelineContext(self._plan, deadline=time.monotonic() + timeout
+                              if timeout is not None else None,
+                              priority=self._priorities()
+                              if self._priority else None)
 
-                nodes.clear()
-                for tname, t in {k: v for k, v in task.items() if v.done()}.items():
-                    degrees[tname] -= 1
-                    pending -= 1
-                    del task[tname]
-                    for succ in self._G.successors(tname):
-                        degrees[succ] -= 1
+        if not self._early_return:
+            await self._schedule(ctx, data)
+        else:
+            loop = asyncio.get_running_loop()
+            ctx.result = loop.create_future()
+            sched = loop.create_task(self._schedule(ctx, data),
+                                     name=self._name + "-schedule")
+            try:
+                await asyncio.wait((sched, ctx.result),
+                                   return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                sched.cancel()
+                raise
 
-            if self._last is not None:
-                _data = self._data.get(self._last, {})
+            if not sched.done():
+                # the remaining nodes keep running, fini() waits for them
+                self._background.add(sched)
+                sched.add_done_callback(self._drained)
             else:
-                _data = self._data.get(self._tree[-1], {})
+                sched.result()
 
+        _data = ctx.data[self._result]
+        if isinstance(_data, list):
+            # fan-out or stream output, the list of the (data, rc) items
+            rep = (copy.deepcopy(_data), 0)
+        else:
             rep = (copy.deepcopy(_data[0]), _data[1])
 
-            await self._cleanup()
+        if ctx.pending == 0:
+            ctx.clear()
         return rep
+
+    async def run_many(self, inputs, concurrency=4, timeout=None,
+                       tracer=None):
+        # inputs is a sync or async iterable, consumed lazily: at most
+        # concurrency inputs are running or waiting to be yielded
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        slots = asyncio.Semaphore(concurrency)
+        lock = asyncio.Lock()
+        index = itertools.count()
+
+        if hasattr(inputs, "__aiter__"):
+            items = inputs.__aiter__()
+        else:
+            items = iter(inputs)
+
+        async def take():
+            async with lock:
+                try:
+                    if hasattr(items, "__anext__"):
+                        data = await items.__anext__()
+                    else:
+                        data = next(items)
+                except (StopIteration, StopAsyncIteration):
+                    return None
+                return next(index), data
+
+        async def worker():
+            while True:
+                await slots.acquire()
+                item = await take()
+                if item is None:
+                    slots.release()
+                    return
+                i, data = item
+                del item
+                queue.put_nowait((i, await self.run(data, timeout=timeout,
+                                                    tracer=tracer)))
+
+        async def produce():
+            workers = [loop.create_task(worker(),
+                                        name=self._name + "-many-" + str(w))
+                       for w in range(concurrency)]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                for w in workers:
+                    w.cancel()
+                raise
+
+        producer = loop.create_task(produce(), name=self._name + "-many")
+        producer.add_done_callback(lambda _: queue.put_nowait(None))
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                slots.release()
+                yield item
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
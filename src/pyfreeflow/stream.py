@@ -0,0 +1,122 @@
+import asyncio
+
+"""
+Streaming node protocol
+
+node:
+- name: "rows"
+  type: "SqLiteExecutor"
+  version: "1.0"
+  stream: true  # Optional, the node yields items through ext.stream()
+  config: {}
+- name: "transform"
+  type: "DataTransformer"
+  version: "1.0"
+  stream: true
+  config: {}
+
+A streaming node runs FreeFlowExt.stream(state, items), an async generator
+consuming an async iterator of (data, rc) items and yielding (data, rc)
+items. Extensions that do not override stream() go through run() one item at
+a time.
+
+When the node starts, every streaming successor with a single predecessor is
+started as well and reads the items through its own bounded queue, so a slow
+consumer suspends the producer. The other successors, and the pipeline result,
+get the list of the items once the stream is over.
+
+When the producer fails, times out or is cancelled, the readers raise
+StreamAborted with its return code instead of ending the stream, so a
+consumer of a truncated stream fails as well.
+"""
+
+
+class StreamAborted(Exception):
+    def __init__(self, rc):
+        super().__init__("stream aborted, rc {}".format(rc))
+        self.rc = rc
+
+
+class StreamReader():
+    def __init__(self, stream, consumer):
+        self._stream = stream
+        self._consumer = consumer
+        self._queue = stream._queues[consumer]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._queue is None:
+            raise StopAsyncIteration
+
+        item = await self._queue.get()
+        if item is None:
+            self._queue = None
+            raise StopAsyncIteration
+        if isinstance(item, StreamAborted):
+            self._queue = None
+            raise item
+        return item
+
+    def close(self):
+        self._queue = None
+        self._stream.detach(self._consumer)
+
+
+class Stream():
+    def __init__(self, consumers=(), collect=False, maxsize=64):
+        self._queues = {j: asyncio.Queue(maxsize) for j in consumers}
+        self._items = [] if collect else None
+        self._piped = len(self._queues) > 0
+
+    def __str__(self):
+        return "Stream(consumers: {c}, collect: {i})".format(
+            c=len(self._queues), i=self._items is not None)
+
+    def reader(self, consumer):
+        return StreamReader(self, consumer)
+
+    def detach(self, consumer):
+        # the consumer is gone, wake up a producer waiting on its queue
+        queue = self._queues.pop(consumer, None)
+        while queue is not None and not queue.empty():
+            queue.get_nowait()
+
+    async def put(self, item):
+        if self._items is not None:
+            self._items.append(item)
+        for queue in list(self._queues.values()):
+            await queue.put(item)
+
+    async def close(self):
+        for queue in list(self._queues.values()):
+            await queue.put(None)
+
+    def abort(self, rc):
+        # the producer failed or was cancelled, the items still queued are
+        # dropped and the consumers get the error
+        for queue in self._queues.values():
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(StreamAborted(rc))
+
+    def unused(self):
+        # every consumer stopped reading and nothing is collected
+        return self._piped and len(self._queues) == 0 and self._items is None
+
+    def items(self):
+        return self._items if self._items is not None else []
+
+
+async def iterate(data):
+    # input of a streaming node: the reader of its predecessor stream, the
+    # items of a fan-in or of a collected stream, or one item
+    if isinstance(data, StreamReader):
+        async for item in data:
+            yield item
+    elif isinstance(data, list):
+        for item in data:
+            yield item
+    else:
+        yield data
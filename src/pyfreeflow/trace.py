@@ -0,0 +1,102 @@
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+
+"""
+Trace of the pipeline runs in the Chrome trace event format, to be opened
+with Perfetto (https://ui.perfetto.dev) or chrome://tracing.
+
+tracer = Tracer()
+await pipe.run(data, tracer=tracer)
+tracer.dump("out.json")
+
+or, with pyfreeflow-cli.py, --trace out.json.
+
+Every asyncio task gets its own track, named after the task: the pipeline
+run, the nodes, the fan-out workers of FreeFlowExt.unpack. A node records the
+time it waited from ready to start and its run, a fan-out worker one span per
+item, the connection pools the wait for a free connection and the opening of
+new ones.
+
+The tracer is held in a context variable, so the spans of the nodes run by
+the executor: process workers are not recorded.
+"""
+
+TRACER = contextvars.ContextVar("pyfreeflow_tracer", default=None)
+NULL = contextlib.nullcontext()
+
+
+class Tracer():
+    def __init__(self):
+        self._pid = os.getpid()
+        self._origin = time.monotonic()
+        self._events = []
+        self._tids = weakref.WeakKeyDictionary()
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return "Tracer(events: {e})".format(e=len(self._events))
+
+    def _tid(self):
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            return threading.get_ident()
+
+        tid = self._tids.get(task)
+        if tid is None:
+            tid = next(self._seq)
+            self._tids[task] = tid
+            self._events.append({
+                "name": "thread_name", "ph": "M", "pid": self._pid,
+                "tid": tid, "args": {"name": task.get_name()}})
+        return tid
+
+    def _ts(self, t):
+        return (t - self._origin) * 1e6
+
+    def complete(self, name, cat, start, end, **args):
+        # start and end from time.monotonic()
+        with self._lock:
+            self._events.append({
+                "name": name, "cat": cat, "ph": "X", "pid": self._pid,
+                "tid": self._tid(), "ts": self._ts(start),
+                "dur": max(0.0, end - start) * 1e6, "args": args})
+
+    def instant(self, name, cat, **args):
+        with self._lock:
+            self._events.append({
+                "name": name, "cat": cat, "ph": "i", "s": "t",
+                "pid": self._pid, "tid": self._tid(),
+                "ts": self._ts(time.monotonic()), "args": args})
+
+    @contextlib.contextmanager
+    def span(self, name, cat, **args):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.complete(name, cat, start, time.monotonic(), **args)
+
+    def events(self):
+        return {"traceEvents": list(self._events), "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.events(), f)
+
+
+def span(name, cat, **args):
+    tracer = TRACER.get()
+    if tracer is None:
+        return NULL
+    return tracer.span(name, cat, **args)
@@ -1,7 +1,11 @@
 import os
+import sys
 import copy
 import re
+import time
+import math
 import asyncio
+import contextvars
 import pyparsing as pp
 import datetime as dt
 import locale
@@ -29,6 +33,27 @@ def deepupdate(base, other, keep=True):
                 base[k] = copy.deepcopy(v)
 
 
+def deepsizeof(obj):
+    seen = set()
+    stack = [obj]
+    size = 0
+
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+
+        size += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+
+    return size
+
+
 def asyncio_run(fn, force=False):
     try:
         return asyncio.create_task(fn)
@@ -39,6 +64,86 @@ def asyncio_run(fn, force=False):
             return asyncio.run(fn)
 
 
+class Deadline():
+    DEADLINE = contextvars.ContextVar("pyfreeflow_deadline", default=None)
+
+    @classmethod
+    def set(cls, deadline):
+        return cls.DEADLINE.set(deadline)
+
+    @classmethod
+    def reset(cls, token):
+        cls.DEADLINE.reset(token)
+
+    @classmethod
+    def get(cls):
+        return cls.DEADLINE.get()
+
+    @classmethod
+    def remaining(cls):
+        deadline = cls.DEADLINE.get()
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+
+    @classmethod
+    def clamp(cls, timeout):
+        remaining = cls.remaining()
+        if timeout is None:
+            return remaining
+        timeout = float(timeout)
+        return timeout if remaining is None else min(timeout, remaining)
+
+
+class LoopLagMonitor():
+    def __init__(self, interval=0.01):
+        self._interval = interval
+        self._samples = []
+        self._task = None
+        self._start = None
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self._interval)
+            self._samples.append(
+                max(0.0, loop.time() - self._start - self._interval))
+            self._start = loop.time()
+
+    def start(self):
+        self._samples = []
+        loop = asyncio.get_running_loop()
+        self._start = loop.time()
+        self._task = loop.create_task(self._probe(), name="pyfreeflow-looplag")
+
+    async def stop(self):
+        if self._task is not None:
+            # the stall in progress when the loop was blocked until now, the
+            # probe is overdue but has not run yet
+            lag = asyncio.get_running_loop().time() - self._start - \
+                self._interval
+            if lag > 0:
+                self._samples.append(lag)
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        return self.stats()
+
+    def stats(self):
+        samples = sorted(self._samples)
+        if len(samples) == 0:
+            return {"samples": 0, "mean": 0.0, "p99": 0.0, "max": 0.0}
+        return {
+            "samples": len(samples),
+            "mean": sum(samples) / len(samples),
+            "p99": samples[math.ceil(len(samples) * 0.99) - 1],
+            "max": samples[-1],
+        }
+
+
 class EnvVarParser():
     SIMPLE_RE = re.compile(r'(?<!\\)\$([a-zA-Z0-9_]+)')
     EXTENDED_RE = re.compile(r'(?<!\\)\$\{([a-zA-Z0-9_]+)((:?-)([^}]+))?\}')
@@ -0,0 +1,106 @@
+from .registry import ExtRegistry
+from .ext.types import FreeFlowExt
+from .utils import Deadline, deepupdate
+import asyncio
+import concurrent.futures
+import copy
+import importlib
+import json
+import logging
+import multiprocessing
+import multiprocessing.util
+import time
+
+"""
+Process pool of the executor: process nodes.
+
+The pipeline keeps a ProcessExt proxy in place of the node: each run ships
+the state and the input to a worker process, which imports the extension
+module, instantiates the node on first use and keeps it, with its sessions
+and connection pools, for the following runs. Workers are started with the
+spawn method and run the nodes on a persistent event loop; the state changes
+made by the node are merged back into the pipeline state.
+
+State, input and output must be picklable.
+"""
+
+NODES = {}
+LOOP = None
+
+
+def _init_worker(loglevel):
+    logging.getLogger("pyfreeflow").setLevel(loglevel)
+
+
+def _fini_worker():
+    if LOOP is None:
+        return
+
+    for ext in NODES.values():
+        LOOP.run_until_complete(ext.fini())
+    NODES.clear()
+    LOOP.close()
+
+
+def _get_node(spec):
+    if spec not in NODES.keys():
+        module, typename, version, name, config = spec
+        importlib.import_module(module)
+        NODES[spec] = ExtRegistry.get_registered_class(typename, version)(
+            name, **json.loads(config))
+    return NODES[spec]
+
+
+async def _call(ext, state, data, deadline):
+    if deadline is None:
+        return await ext.run(state, data)
+
+    # CLOCK_MONOTONIC is shared by the processes of the host
+    Deadline.set(deadline)
+    return await asyncio.wait_for(ext.run(state, data),
+                                  max(0.0, deadline - time.monotonic()))
+
+
+def _run(spec, state, data, deadline):
+    global LOOP
+
+    if LOOP is None:
+        LOOP = asyncio.new_event_loop()
+        asyncio.set_event_loop(LOOP)
+        multiprocessing.util.Finalize(None, _fini_worker, exitpriority=10)
+
+    return LOOP.run_until_complete(
+        _call(_get_node(spec), state, data, deadline))
+
+
+def process_pool(processes=None):
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(logging.getLogger("pyfreeflow").getEffectiveLevel(),))
+
+
+class ProcessExt(FreeFlowExt):
+    def __init__(self, name, pool, cls, config={}):
+        super().__init__(name)
+        self._pool = pool
+        self._spec = (cls.__module__, cls.__typename__, cls.__version__, name,
+                      json.dumps(config, sort_keys=True))
+
+        self._logger = logging.getLogger(".".join([__name__, "ProcessExt",
+                                                   self._name]))
+
+    def __str__(self):
+        return "ProcessExt(name: {n}, type: {t}, version: {v})".format(
+            n=self._name, t=self._spec[1], v=self._spec[2])
+
+    async def run(self, state, data={}):
+        # the executor pickles the arguments in a feeder thread, while the
+        # other nodes keep updating the run state on the loop
+        async with self._resource:
+            s, out = await asyncio.get_running_loop().run_in_executor(
+                self._pool, _run, self._spec, copy.deepcopy(state), data,
+                Deadline.get())
+        deepupdate(state, s)
+        return state, out
@@ -0,0 +1,168 @@
+import asyncio
+import pytest
+import pyfreeflow
+from pyfreeflow.cache import ResultCache, DiskResultCache
+from pyfreeflow.pipeline import Pipeline
+from pyfreeflow.utils import deepsizeof
+
+pyfreeflow.load_extension("pyfreeflow.ext.data_transformer")
+pyfreeflow.load_extension("pyfreeflow.ext.sleep_operator")
+
+
+def transformer(name, code, **kwargs):
+    return dict({"name": name, "type": "DataTransformer", "version": "1.0",
+                 "config": {"transformer": code}}, **kwargs)
+
+
+def sleep(name, seconds=0, **kwargs):
+    return dict({"name": name, "type": "SleepOperator", "version": "1.0",
+                 "config": {"sleep": seconds}}, **kwargs)
+
+
+async def runs(node, digraph, inputs, **kwargs):
+    pipe = Pipeline()
+    await pipe.init(node=node, digraph=digraph, name="test", **kwargs)
+    try:
+        out = [await pipe.run(x) for x in inputs]
+        return out, pipe.cache_stats()
+    finally:
+        await pipe.fini()
+
+
+def test_transformer_cannot_be_cached():
+    node = [transformer("A", "state.x = 1 data = {}", cache={})]
+    with pytest.raises(ValueError):
+        asyncio.run(runs(node, ["A"], []))
+
+
+@pytest.mark.parametrize("state,hits", [(False, 1), (True, 0)])
+def test_key_ignores_the_run_state(state, hits):
+    # T writes the run input in the state, S gets the same input every run
+    node = [transformer("T", "state.t = data.t data = {v = 1}"),
+            sleep("S", cache={"state": state})]
+    out, stats = asyncio.run(runs(node, ["T -> S"], [{"t": 1}, {"t": 2}]))
+    assert out == [({"v": 1}, 0)] * 2
+    assert stats["S"]["hits"] == hits
+
+
+def test_disk_cache_across_event_loops(tmp_path):
+    # one asyncio.run() per call, the cache lock must not stay bound to the
+    # first loop
+    path = str(tmp_path / "cache.db")
+    node = [sleep(x, cache={"path": path}) for x in ("A", "B")]
+    first = asyncio.run(runs(node, ["A", "B"], [{"x": 1}]))
+    second = asyncio.run(runs(node, ["A", "B"], [{"x": 1}]))
+    assert first[0] == second[0] == [({"x": 1}, 0)]
+    assert [x["hits"] for x in second[1].values()] == [1, 1]
+
+
+def test_disk_cache_open_failure_runs_the_node(tmp_path):
+    path = tmp_path / "cache.db"
+    path.write_text("not a database " * 100)
+    node = [sleep("S", cache={"path": str(path)})]
+    out, stats = asyncio.run(runs(node, ["S"], [{"x": 1}, {"x": 1}]))
+    assert out == [({"x": 1}, 0)] * 2
+    assert stats["S"]["hits"] == 0
+
+
+def memory(**kwargs):
+    return ResultCache(**kwargs)
+
+
+def disk(tmp_path, **kwargs):
+    return DiskResultCache(str(tmp_path / "cache.db"), "N", "config",
+                           **kwargs)
+
+
+@pytest.fixture(params=["memory", "disk"])
+def cache(request, tmp_path):
+    def create(**kwargs):
+        if request.param == "memory":
+            return memory(**kwargs)
+        return disk(tmp_path, **kwargs)
+    return create
+
+
+def test_hit_and_miss(cache):
+    async def run(c):
+        try:
+            miss = await c.get("k")
+            await c.put("k", ({"v": 1}, 0))
+            return miss, await c.get("k"), c.stats()
+        finally:
+            await c.close()
+
+    miss, hit, stats = asyncio.run(run(cache()))
+    assert miss is None and hit == ({"v": 1}, 0)
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_only_successful_results_are_stored(cache):
+    async def run(c):
+        try:
+            await c.put("a", (None, 101))
+            await c.put("b", [({}, 0), (None, 101)])
+            await c.put("c", [({}, 0), ({}, 0)])
+            return [await c.get(x) for x in ("a", "b", "c")]
+        finally:
+            await c.close()
+
+    assert asyncio.run(run(cache())) == [None, None, [({}, 0), ({}, 0)]]
+
+
+def test_hit_is_a_copy():
+    async def run(c):
+        await c.put("k", ({"v": [1]}, 0))
+        (await c.get("k"))[0]["v"].append(2)
+        return await c.get("k")
+
+    assert asyncio.run(run(memory())) == ({"v": [1]}, 0)
+
+
+def test_ttl_expires_entries(cache):
+    async def run(c):
+        try:
+            await c.put("k", ({}, 0))
+            await asyncio.sleep(0.1)
+            return await c.get("k"), c.stats()
+        finally:
+            await c.close()
+
+    out, stats = asyncio.run(run(cache(ttl=0.05)))
+    assert out is None
+    assert stats["expirations"] == 1
+
+
+def test_ttl_duration_string():
+    assert ResultCache.parse_ttl("1m30s") == 90
+
+
+def test_lru_eviction(cache):
+    async def run(c):
+        try:
+            await c.put("a", ({}, 0))
+            await c.put("b", ({}, 0))
+            await asyncio.sleep(0.01)
+            # a becomes the most recently used
+            await c.get("a")
+            await c.put("c", ({}, 0))
+            return [await c.get(x) is not None for x in ("a", "b", "c")], \
+                c.stats()
+        finally:
+            await c.close()
+
+    out, stats = asyncio.run(run(cache(max_entries=2)))
+    assert out == [True, False, True]
+    assert stats["evictions"] == 1
+
+
+def test_max_bytes_eviction():
+    async def run(c):
+        await c.put("a", ("x" * 1000, 0))
+        await c.put("b", ("x" * 1000, 0))
+        return [await c.get(x) is not None for x in ("a", "b")], c.stats()
+
+    size = deepsizeof(("x" * 1000, 0))
+    out, stats = asyncio.run(run(memory(max_bytes=size + size // 2)))
+    assert out == [False, True]
+    assert stats["bytes"] == size
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+import pyfreeflow
+from pyfreeflow.graph import ExecutionPlan
+from pyfreeflow.critical_path import CriticalPath
+from pyfreeflow.pipeline import Pipeline
+
+#   A (2) -> B (3) -> D (1)
+#   A (2) -> C (1) -> D (1)
+#   E (1)
+PLAN = ExecutionPlan.compile(["A -> B -> D", "A -> C -> D", "E"])
+TIMING = {"A": (10.0, 12.0), "B": (12.0, 15.0), "C": (12.5, 13.5),
+          "D": (15.0, 16.0), "E": (10.0, 11.0)}
+
+
+def critical_path(timing=TIMING):
+    return CriticalPath(PLAN, 10.0, 16.5,
+                        [timing.get(n) for n in PLAN.names])
+
+
+def test_makespan_and_path():
+    cp = critical_path()
+    assert cp.makespan() == pytest.approx(6.0)
+    assert cp.path() == ["A", "B", "D"]
+
+
+def test_slack():
+    cp = critical_path()
+    slack = {n: cp.slack(i) for i, n in enumerate(PLAN.names)}
+    assert slack == pytest.approx({"A": 0.0, "B": 0.0, "C": 2.0, "D": 0.0,
+                                   "E": 5.0})
+
+
+def test_speedup():
+    cp = critical_path()
+    # B 20% faster: 2 + 2.4 + 1
+    assert cp.speedup(PLAN.index["B"], 20) == pytest.approx(6.0 / 5.4)
+    # C has slack, the run does not get shorter
+    assert cp.speedup(PLAN.index["C"], 20) == pytest.approx(1.0)
+    # A half the time: 1 + 3 + 1
+    assert cp.speedup(PLAN.index["A"], 50) == pytest.approx(6.0 / 5.0)
+
+
+def test_report():
+    report = critical_path().report()
+    assert report["observed"] == pytest.approx(6.5)
+    assert report["critical_path"] == ["A", "B", "D"]
+    nodes = report["nodes"]
+    assert nodes["C"]["start"] == pytest.approx(2.5)
+    # C started 0.5s after A ended
+    assert nodes["C"]["wait"] == pytest.approx(0.5)
+    assert nodes["D"]["wait"] == pytest.approx(0.0)
+    assert [n for n, x in nodes.items() if x["critical"]] == ["A", "B", "D"]
+
+
+def test_nodes_not_run():
+    timing = dict(TIMING)
+    del timing["C"]
+    report = critical_path(timing).report()
+    assert report["nodes"]["C"]["start"] is None
+    assert report["nodes"]["C"]["wait"] is None
+    assert report["nodes"]["C"]["speedup"] == 1.0
+    assert report["makespan"] == pytest.approx(6.0)
+
+
+def test_text():
+    text = critical_path().text()
+    assert "critical path: A -> B -> D" in text
+    assert "makespan: 6000.000 ms" in text
+
+
+def test_pipeline_reports_the_last_run():
+    pyfreeflow.load_extension("pyfreeflow.ext.sleep_operator")
+    node = [{"name": n, "type": "SleepOperator", "version": "1.0",
+             "config": {"sleep": s}}
+            for n, s in (("A", 0.05), ("B", 0.2), ("C", 0.0), ("D", 0.05))]
+
+    async def run():
+        pipe = Pipeline()
+        await pipe.init(node=node, digraph=["A -> B -> D", "A -> C -> D"],
+                        name="test")
+        try:
+            assert pipe.critical_path() is None
+            await pipe.run({})
+            return pipe.critical_path()
+        finally:
+            await pipe.fini()
+
+    cp = asyncio.run(run())
+    assert cp.path() == ["A", "B", "D"]
+    assert cp.makespan() == pytest.approx(0.3, abs=0.05)
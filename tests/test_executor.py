@@ -0,0 +1,46 @@
+import asyncio
+import sys
+import pyfreeflow
+from pyfreeflow.ext.types import FreeFlowExt
+from pyfreeflow.pipeline import Pipeline
+
+pyfreeflow.load_extension("pyfreeflow.ext.data_transformer")
+
+
+class StateWriterV1_0(FreeFlowExt):
+    __typename__ = "TestStateWriter"
+    __version__ = "1.0"
+
+    async def run(self, state, data):
+        # grows the run state on the loop, yielding often
+        for k in range(2000):
+            state["w{}".format(k)] = k
+            if k % 50 == 0:
+                await asyncio.sleep(0)
+        return state, ({}, 0)
+
+
+def test_thread_transform_with_concurrent_state_updates():
+    node = [{"name": "R", "type": "DataTransformer", "version": "1.0",
+             "config": {"transformer": "state.big = {} for i = 1, 20000 do "
+                        "state.big['k' .. i] = i end data = {}"}},
+            {"name": "X", "type": "DataTransformer", "version": "1.0",
+             "executor": "thread", "config": {"transformer": "data = {n = 1}"}},
+            {"name": "W", "type": "TestStateWriter", "version": "1.0"}]
+
+    async def run():
+        pipe = Pipeline()
+        await pipe.init(node=node, digraph=["R -> X", "R -> W"], last="X",
+                        threads=2, name="test")
+        try:
+            return [await pipe.run({}) for _ in range(3)]
+        finally:
+            await pipe.fini()
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-4)
+    try:
+        out = asyncio.run(run())
+    finally:
+        sys.setswitchinterval(interval)
+    assert out == [({"n": 1}, 0)] * 3
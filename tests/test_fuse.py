@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+import pyfreeflow
+from pyfreeflow.pipeline import Pipeline
+
+pyfreeflow.load_extension("pyfreeflow.ext.data_transformer")
+
+# indexes a nil value, the node outputs (None, 101)
+FAIL = "data = data.missing.field"
+
+
+def chain(*code):
+    return [{"name": "T{}".format(k), "type": "DataTransformer",
+             "version": "1.0", "config": {"transformer": x}}
+            for k, x in enumerate(code)]
+
+
+async def run(node, data, fuse):
+    pipe = Pipeline()
+    digraph = [" -> ".join(x["name"] for x in node)]
+    await pipe.init(node=node, digraph=digraph, name="test", fuse=fuse)
+    try:
+        # a fused chain is one node of the plan
+        return len(pipe.plan()), await pipe.run(data)
+    finally:
+        await pipe.fini()
+
+
+def both(node, data={}):
+    fused = asyncio.run(run(node, data, True))
+    unfused = asyncio.run(run(node, data, False))
+    assert fused[0] < unfused[0]
+    return fused[1], unfused[1]
+
+
+def test_fused_chain_gives_the_unfused_output():
+    node = chain("data = {v = data.v + 1, l = {1, 2}}",
+                 "state.s = data.v data = {v = data.v * 2, l = data.l}",
+                 "data = {v = data.v + state.s, n = #data.l, e = {}}")
+    fused, unfused = both(node, {"v": 1})
+    assert fused == unfused == ({"v": 6, "n": 2, "e": {}}, 0)
+
+
+def test_fused_chain_keeps_the_state_updates():
+    node = chain("state.a = {x = 1} data = {}",
+                 "state.a.y = 2 data = {}",
+                 "data = {a = state.a}")
+    fused, unfused = both(node)
+    assert fused == unfused == ({"a": {"x": 1, "y": 2}}, 0)
+
+
+@pytest.mark.parametrize("stage,rc", [(0, 103), (1, 103), (2, 101)])
+def test_failing_stage_rc(stage, rc):
+    code = ["data = {v = 1}"] * 3
+    code[stage] = FAIL
+    fused, unfused = both(chain(*code))
+    assert fused == unfused == (None, rc)
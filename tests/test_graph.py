@@ -0,0 +1,67 @@
+import pytest
+from pyfreeflow.graph import DigraphParser, ExecutionPlan
+
+
+def test_parse_chains_and_statements():
+    node, edges = DigraphParser.parse(["A -> B -> C; A -> D", "E"])
+    assert node == ["A", "B", "C", "D", "E"]
+    assert edges == [("A", "B"), ("B", "C"), ("A", "D")]
+
+
+def test_parse_quoted_names_attributes_and_comments():
+    node, edges = DigraphParser.parse([
+        "# comment",
+        "// comment",
+        '"node with spaces" -> "say \\"hi\\"" [label="x -> y"]',
+        '"node with spaces" -> B',
+    ])
+    assert node == ["node with spaces", 'say "hi"', "B"]
+    assert edges == [("node with spaces", 'say "hi"'),
+                     ("node with spaces", "B")]
+
+
+def test_parse_duplicate_edges_once():
+    _, edges = DigraphParser.parse(["A -> B", "A -> B; A -> B"])
+    assert edges == [("A", "B")]
+
+
+@pytest.mark.parametrize("line", ["A ->", "-> B", "A -> -> B", "A B",
+                                  'A -> "B'])
+def test_parse_rejects_invalid_statements(line):
+    with pytest.raises(ValueError):
+        DigraphParser.parse([line])
+
+
+def test_cycle_is_rejected_with_its_path():
+    with pytest.raises(ValueError, match="cycle: B -> C -> B"):
+        ExecutionPlan.compile(["A -> B -> C -> B"])
+
+
+def test_self_loop_is_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        ExecutionPlan.compile(["A -> A"])
+
+
+def test_plan_is_topological_and_indexed():
+    plan = ExecutionPlan.compile(["C -> D", "A -> B -> C", "A -> D"])
+    assert plan.names == ("A", "B", "C", "D")
+    assert plan.index == {"A": 0, "B": 1, "C": 2, "D": 3}
+    assert plan.pred == ((), (0,), (1,), (2, 0))
+    assert plan.succ == ((1, 3), (2,), (3,), ())
+    assert plan.indegree == (0, 1, 1, 2)
+    assert plan.outdegree == (2, 1, 1, 0)
+
+
+def test_plan_ancestors_and_subplan():
+    plan = ExecutionPlan.compile(["A -> B -> D", "C -> D", "E"])
+    keep = plan.ancestors([plan.index["B"]])
+    assert sorted(plan.names[i] for i in keep) == ["A", "B"]
+    sub = plan.subplan(keep)
+    assert sub.names == ("A", "B")
+    assert sub.pred == ((), (0,))
+
+
+def test_plan_is_immutable():
+    plan = ExecutionPlan.compile(["A -> B"])
+    with pytest.raises(AttributeError):
+        plan.names = ()
@@ -0,0 +1,105 @@
+import asyncio
+import sqlite3
+import pytest
+import pyfreeflow
+from pyfreeflow.pipeline import Pipeline
+
+pyfreeflow.load_extension("pyfreeflow.ext.data_transformer")
+pyfreeflow.load_extension("pyfreeflow.ext.file_operator")
+pyfreeflow.load_extension("pyfreeflow.ext.sqlite_executor")
+
+
+class Counter():
+    def __init__(self):
+        self.acquired = 0
+
+    async def __aenter__(self):
+        self.acquired += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+def test_stream_file_writes_acquire_the_resource(tmp_path):
+    path = str(tmp_path / "out.txt")
+    write = "data = {{op = 'write', path = '{}', data = '{}'}}"
+    node = [{"name": x, "type": "DataTransformer", "version": "1.0",
+             "config": {"transformer": write.format(path, x)}}
+            for x in ("A", "B", "C")]
+    node.append({"name": "W", "type": "AnyFileOperator", "version": "1.0",
+                 "stream": True, "resource": "io"})
+
+    async def run():
+        pipe = Pipeline()
+        await pipe.init(node=node, digraph=["A -> W", "B -> W", "C -> W"],
+                        resources={"io": 1}, name="test")
+        counter = Counter()
+        pipe._node[pipe.plan().index["W"]].set_resource(counter)
+        try:
+            out = await pipe.run({})
+        finally:
+            await pipe.fini()
+        return out, counter.acquired
+
+    (data, rc), acquired = asyncio.run(run())
+    assert [x[1] for x in data] == [0, 0, 0]
+    assert acquired == 3
+    with open(path) as f:
+        assert f.read() == "ABC"
+
+
+
+@pytest.mark.skipif(not hasattr(sqlite3.Connection, "enable_load_extension"),
+                    reason="sqlite3 built without extension loading")
+def test_stream_consumer_shares_the_resource_class(tmp_path):
+    path = str(tmp_path / "rows.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE t (i INTEGER)")
+    db.executemany("INSERT INTO t VALUES (?)", [(x,) for x in range(500)])
+    db.commit()
+    db.close()
+
+    node = [{"name": "Q", "type": "SqLiteExecutor", "version": "1.0",
+             "stream": True, "resource": "db",
+             "config": {"path": path, "statement": "SELECT i FROM t",
+                        "chunk_size": 1}},
+            {"name": "T", "type": "DataTransformer", "version": "1.0",
+             "stream": True, "resource": "db",
+             "config": {"transformer": "data = data.resultset[1]"}}]
+
+    async def run():
+        pipe = Pipeline()
+        await pipe.init(node=node, digraph=["Q -> T"], resources={"db": 1},
+                        stream_buffer=4, name="test")
+        try:
+            return await asyncio.wait_for(pipe.run({"x": 1}), 5)
+        finally:
+            await pipe.fini()
+
+    # the producer releases the slot before waiting on the full queue
+    out = asyncio.run(run())
+    assert out == ([([x], 0) for x in range(500)], 0)
+
+
+def test_max_concurrency_wait_counts_against_the_node_timeout():
+    pyfreeflow.load_extension("pyfreeflow.ext.sleep_operator")
+    node = [{"name": "A", "type": "SleepOperator", "version": "1.0",
+             "config": {"sleep": 0.3}},
+            {"name": "B", "type": "SleepOperator", "version": "1.0",
+             "timeout": 0.2, "config": {"sleep": 0.1}},
+            {"name": "C", "type": "SleepOperator", "version": "1.0",
+             "config": {"sleep": 0}}]
+
+    async def run():
+        pipe = Pipeline()
+        # A has the longer downstream path, it gets the slot first
+        await pipe.init(node=node, digraph=["A -> C", "B"], last="B",
+                        max_concurrency=1, name="test")
+        try:
+            return await pipe.run({"x": 1})
+        finally:
+            await pipe.fini()
+
+    # B waits 0.3s for the slot, over its 0.2s timeout
+    assert asyncio.run(run()) == (None, 104)
@@ -0,0 +1,35 @@
+import logging
+import queue
+import sys
+from pyfreeflow import LogQueueHandler
+
+
+def record(msg, args, exc_info=None):
+    return logging.LogRecord("test", logging.ERROR, __file__, 1, msg, args,
+                             exc_info)
+
+
+def test_mutable_arguments_are_rendered_by_the_caller():
+    value = {"a": 1}
+    out = LogQueueHandler(queue.SimpleQueue()).prepare(
+        record("value %s", (value,)))
+    value["a"] = 2
+    assert out.getMessage() == "value {'a': 1}"
+
+
+def test_scalar_arguments_are_left_to_the_listener():
+    out = LogQueueHandler(queue.SimpleQueue()).prepare(
+        record("%s %d", ("a", 1)))
+    assert out.args == ("a", 1)
+    assert out.getMessage() == "a 1"
+
+
+def test_traceback_is_rendered_by_the_caller():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        exc_info = sys.exc_info()
+    out = LogQueueHandler(queue.SimpleQueue()).prepare(
+        record("failed", None, exc_info))
+    assert out.exc_info is None
+    assert "ValueError: boom" in out.exc_text
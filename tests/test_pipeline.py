@@ -0,0 +1,102 @@
+import asyncio
+import time
+import pytest
+import pyfreeflow
+from pyfreeflow.pipeline import Pipeline, SKIPPED, CANCELLED
+
+pyfreeflow.load_extension("pyfreeflow.ext.data_transformer")
+pyfreeflow.load_extension("pyfreeflow.ext.sleep_operator")
+
+
+def transformer(name, code, force=False, **kwargs):
+    return dict({"name": name, "type": "DataTransformer", "version": "1.0",
+                 "config": {"transformer": code, "force": force}}, **kwargs)
+
+
+def sleep(name, seconds=0, **kwargs):
+    return dict({"name": name, "type": "SleepOperator", "version": "1.0",
+                 "config": {"sleep": seconds}}, **kwargs)
+
+
+async def run(node, digraph, inputs=({},), **kwargs):
+    pipe = Pipeline()
+    await pipe.init(node=node, digraph=digraph, name="test", fuse=False,
+                    **kwargs)
+    try:
+        return await asyncio.gather(*[pipe.run(x) for x in inputs])
+    finally:
+        await pipe.fini()
+
+
+# indexes a nil value, the node outputs (None, 101)
+FAIL = "data = data.missing.field"
+
+
+DIAMOND = (
+    [transformer("A", "data = {v = data.v}"),
+     transformer("B", "data = {b = data.v + 1}"),
+     transformer("C", "data = {c = data.v + 2}"),
+     transformer("D", "data = {sum = data[1].b + data[2].c}")],
+    ["A -> B -> D", "A -> C -> D"],
+)
+
+
+def test_ready_queue_runs_every_node_once_predecessors_complete():
+    assert asyncio.run(run(*DIAMOND, inputs=[{"v": 1}])) == \
+        [({"sum": 5}, 0)]
+
+
+def test_concurrent_runs_do_not_share_outputs():
+    out = asyncio.run(run(*DIAMOND, inputs=[{"v": x} for x in range(20)]))
+    assert out == [({"sum": 2 * x + 3}, 0) for x in range(20)]
+
+
+def test_independent_nodes_run_concurrently():
+    node = [sleep(x, 0.2) for x in ("A", "B", "C")]
+    start = time.monotonic()
+    asyncio.run(run(node, ["A", "B", "C"]))
+    assert time.monotonic() - start < 0.5
+
+
+def test_state_is_shared_along_the_run():
+    node = [transformer("A", "state.x = 1 data = {}"),
+            transformer("B", "data = {x = state.x}")]
+    assert asyncio.run(run(node, ["A -> B"])) == [({"x": 1}, 0)]
+
+
+@pytest.mark.parametrize("on_error,out", [
+    ("continue", ({"ran": True}, 0)),
+    ("skip", (None, SKIPPED)),
+])
+def test_on_error_policy(on_error, out):
+    node = [transformer("A", FAIL),
+            transformer("B", "data = {}", force=True),
+            transformer("C", "data = {ran = true}", force=True)]
+    assert asyncio.run(run(node, ["A -> B -> C"], on_error=on_error)) == \
+        [out]
+
+
+@pytest.mark.parametrize("pipeline,node,out", [
+    ("continue", "skip", (None, SKIPPED)),
+    ("skip", "continue", ({"ran": True}, 0)),
+])
+def test_node_on_error_overrides_the_pipeline(pipeline, node, out):
+    node = [transformer("A", FAIL, on_error=node),
+            transformer("B", "data = {ran = true}", force=True)]
+    assert asyncio.run(run(node, ["A -> B"], on_error=pipeline)) == [out]
+
+
+def test_critical_failure_cancels_the_run():
+    node = [transformer("A", FAIL, critical=True),
+            sleep("S", 5),
+            transformer("B", "data = {ran = true}", force=True)]
+    start = time.monotonic()
+    out = asyncio.run(run(node, ["A -> B", "S"], last="S"))
+    assert time.monotonic() - start < 1
+    assert out == [(None, CANCELLED)]
+
+
+def test_critical_failure_skips_the_nodes_not_started():
+    node = [transformer("A", FAIL, critical=True),
+            transformer("B", "data = {ran = true}", force=True)]
+    assert asyncio.run(run(node, ["A -> B"])) == [(None, SKIPPED)]
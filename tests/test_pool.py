@@ -0,0 +1,32 @@
+import asyncio
+from pyfreeflow.ext.mpd_executor import ConnectionPool
+
+
+def test_mpd_pool_releases_the_slot_when_connect_is_cancelled():
+    async def run():
+        closed = asyncio.Event()
+
+        async def silent(reader, writer):
+            # never sends the greeting, the connect waits for it
+            await closed.wait()
+            writer.close()
+
+        server = await asyncio.start_server(silent, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        ConnectionPool.register("test", {"host": "127.0.0.1", "port": port})
+        lock = ConnectionPool.CLIENT["test"]["lock"]
+        slots = lock._value
+        try:
+            await asyncio.wait_for(ConnectionPool.get("test"), 0.1)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            closed.set()
+            server.close()
+            await server.wait_closed()
+            del ConnectionPool.CLIENT["test"]
+            del ConnectionPool.POOL["test"]
+        return slots, lock._value
+
+    slots, left = asyncio.run(run())
+    assert left == slots
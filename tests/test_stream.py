@@ -0,0 +1,50 @@
+import asyncio
+import pyfreeflow
+from pyfreeflow.pipeline import Pipeline, SKIPPED, TIMEOUT
+
+pyfreeflow.load_extension("pyfreeflow.ext.data_transformer")
+pyfreeflow.load_extension("pyfreeflow.ext.sleep_operator")
+
+
+def transformer(name, code, **kwargs):
+    return dict({"name": name, "type": "DataTransformer", "version": "1.0",
+                 "config": {"transformer": code}}, **kwargs)
+
+
+def sleep(name, seconds, **kwargs):
+    return dict({"name": name, "type": "SleepOperator", "version": "1.0",
+                 "config": {"sleep": seconds}}, **kwargs)
+
+
+async def run(node, digraph, data={}, timeout=None, **kwargs):
+    pipe = Pipeline()
+    await pipe.init(node=node, digraph=digraph, name="test", **kwargs)
+    try:
+        return await pipe.run(data, timeout=timeout)
+    finally:
+        await pipe.fini()
+
+
+def test_producer_skipped_before_opening():
+    node = [transformer("A", "error('boom')", on_error="skip"),
+            sleep("P", 0, stream=True),
+            transformer("C", "data = {seen = true}", stream=True)]
+    out = asyncio.run(run(node, ["A -> P -> C"]))
+    assert out == (None, SKIPPED)
+
+
+def test_producer_timed_out_before_opening():
+    node = [sleep("P", 0, stream=True),
+            transformer("C", "data = {seen = true}", stream=True)]
+    out = asyncio.run(run(node, ["P -> C"], timeout=0))
+    assert out == (None, TIMEOUT)
+
+
+def test_producer_aborted_mid_stream():
+    node = [transformer("A", "data = {id = 1}"),
+            transformer("B", "data = {id = 2}"),
+            transformer("D", "data = {id = 3}"),
+            sleep("P", 0.2, stream=True, timeout=0.3),
+            transformer("C", "data.seen = true", stream=True)]
+    out = asyncio.run(run(node, ["A -> P", "B -> P", "D -> P", "P -> C"]))
+    assert out == (None, TIMEOUT)
@@ -0,0 +1,16 @@
+import asyncio
+import time
+from pyfreeflow.utils import LoopLagMonitor
+
+
+def test_loop_lag_records_the_stall_in_progress():
+    async def run():
+        monitor = LoopLagMonitor(interval=0.01)
+        monitor.start()
+        # blocks the loop until the end of the measured window
+        time.sleep(0.1)
+        return await monitor.stop()
+
+    lag = asyncio.run(run())
+    assert lag["samples"] == 1
+    assert lag["max"] >= 0.08